@@ -19,6 +19,8 @@
 
 """
 Usage:
+  acs_report_prs.py [--config=<config.json>]
+  acs_report_prs.py (-h | --help)
 
 Sample json file contents:
 
@@ -39,25 +41,76 @@ acs_report_prs.py --config=conf.txt
 Additional Option:
 
     "--docker_created_config":"True"     used to know whether to remove conf file if in container (for some safety)    
-
-
-requires: python3.8 + pip install docopt pygithub prettytable pygit2
+    "--fetch_backend":"graphql"          fetch PRs with 'rest' search + PR records (default),
+                                         100 PRs per 'graphql' query or 'async' concurrent requests
+                                         (needs aiohttp)
+    "--gh_api_url":"https://..."         the Github API to talk to (default https://api.github.com)
+    "--pr_store":"True"                  keep PR records in a SQLite store under --tmp_dir and only
+                                         fetch PRs updated since the last run
+    "--http_cache":"False"               turn off the conditional request (ETag) cache kept under --tmp_dir
+    "--workers":"8"                      fetch and classify PRs on this many threads (default 1)
+    "--reconcile_labels":"True"          also run the label reconciler checks on the same fetch of PRs
+                                         and write its tables to 'labels' next to the report
+    "--update_labels":"True"             with --reconcile_labels, write the planned label changes to Github
+    "--output_format":"csv"              write the tables as 'rst' grid tables (default), 'markdown',
+                                         'csv' or 'json' lines, the labels file follows the same format
+    "--watch":"300"                      keep running and refresh the report every 300 seconds, the Github
+                                         client, git mirror and PRs stay in memory and each refresh only
+                                         fetches PRs updated since the last one (with --reconcile_labels
+                                         the labels file is refreshed too)
+    "--webhook_port":"8080"              keep running and apply Github pull_request and label webhook events
+                                         as they arrive, only the rows of the PRs an event touches are
+                                         recomputed before the report (and labels file) is rewritten.
+                                         Deliveries must be signed with "--webhook_secret"; events can be
+                                         replayed locally with replay_webhooks.py
+    "--pr_base":"4.19"                   only report PRs targeting this branch (e.g. for an LTS branch report),
+                                         by default all PRs of the repo are reported
+    "--mirror_dir":"/tmp/mirrors/x"      where the git mirror used for revert detection and release tags lives
+                                         (default <tmp_dir>/repo), runs on the same repo can share one
+    "--merged_from":"git"                take the merged PRs from the git mirror, the merge and squash commits in
+                                         <previous release>..<branch> (exact per branch, reverted PRs left out),
+                                         and fetch just those PRs by number. The default 'search' reports the
+                                         PRs merged anywhere in the repo since the previous release's date
+    "--profile":"True"                   profile the run, writes acs_report_prs.pstats and a collapsed stack
+                                         file for flamegraphs (acs_report_prs.collapsed) next to the report
+
+    Per-phase timings, API calls by endpoint, bytes received, cache hits and rate limit use are
+    written next to the report as <name>.metrics.json and as a Prometheus textfile <name>.prom.
+
+    "--prev_release_ver" alone is enough to start a run: the version's tag is looked up in the git
+    mirror (the API only for tags the mirror lacks) and kept in <mirror_dir>.tags.json with its date.
+
+    "--gh_token" can also be a comma separated list (or JSON list) of tokens, requests are paced
+    against each token's core/search rate limits and rotated across them.
+
+
+requires: python3.8 + pip install docopt pygithub prettytable pygit2 (+ aiohttp for the async backend)
 + git
 
 """
 
 import docopt
 import json
-from github import Github
-from prettytable import PrettyTable
+from github import GithubException
 import os.path
 import sys
 from  datetime import datetime, timedelta
 from lib import processors
-import operator
-import re
+from lib import fetch
+from lib import gh_client
+from lib import git_mirror
+from lib import label_plan
+from lib import metrics
+from lib import pr_collection
+from lib import pr_store
+from lib import profiling
+from lib import reconcile
+from lib import render
+from lib import report_state
+from lib import tag_index
+from lib import webhooks
+from lib import workers
 import time
-import shutil
 
 
 
@@ -101,6 +154,390 @@ def merge(primary, secondary):
     return dict((str(key), primary.get(key) or secondary.get(key))
                 for key in set(secondary) | set(primary))
 
+def classify_open_pr(pr):
+    """
+    Work out the table rows and counters for an open PR.
+    Runs on worker threads, so it only returns what to change.
+    """
+    result = workers.new_result()
+    pr_num = str(pr.number)
+    labels = pr.labels
+    if "wip_features" in required_tables:
+        if [l for l in labels if l=='wip']:
+            result['rows'].append(('wip_features', [pr_num, pr.title.strip(), "-", "-", 1]))
+            result['log'].append("-- Found open PR : " + pr_num + " with WIP label")
+            result['counts'].append('wip_features')
+    if "old_prs" in required_tables:
+        creation_date = pr.created_at
+        check_date_old = datetime.now() - timedelta(days=365)
+        check_date_very_old = datetime.now() - timedelta(days=2*365)
+        if creation_date < check_date_very_old:
+            result['log'].append("**** More than 2 years old")
+            result['counts'].append('old_prs')
+            result['rows'].append(('old_prs', [pr_num, pr.title.strip(), "Very old PR", "Add label age:2years_plus", 2]))
+
+        elif creation_date < check_date_old:
+            result['log'].append("**** More than 1 year old")
+            result['counts'].append('old_prs')
+            result['rows'].append(('old_prs', [pr_num, pr.title.strip(), "Old PR", "Add label age:1year_plus", 1]))
+    return result
+
+def classify_merged_pr(pr):
+    """
+    Work out the table rows and counters for a merged PR.
+    Runs on worker threads, so it only returns what to change.
+    """
+    result = workers.new_result()
+    label_matches = 0
+    pr_commit_sha = pr.merge_commit_sha
+    if pr_commit_sha in reverted_shas:
+        result['log'].append("- Skipping PR %s, its been reverted" % pr_commit_sha)
+        return result
+
+    pr_num = str(pr.number)
+    labels = pr.labels
+    severity_label = pr.severity
+    severity_index = pr.severity_index
+
+    if "merged_features" in required_tables:
+        if [l for l in labels if l=='type:new-feature' or l=='type:new_feature']:
+            result['rows'].append(('merged_features', [pr_num, pr.title.strip(), "New Feature", "-", 1 ]))
+            result['log'].append("-- Found PR: " + pr_num + " with feature label")
+            result['counts'].append('merged_features')
+            label_matches += 1
+    if "merged_features" in required_tables:
+        if [l for l in labels if l=='type:enhancement']:
+            result['rows'].append(('merged_features', [pr_num, pr.title.strip(), "Enhancement", "-", 2]))
+            result['log'].append("-- Found PR: " + pr_num + " with enhancement label")
+            result['counts'].append('merged_features')
+            label_matches += 1
+    if "merged_fixes" in required_tables:
+        if [l for l in labels if l == 'type:bug' or l == 'type:cleanup']:
+            result['rows'].append(('merged_fixes', [pr_num, pr.title.strip(), "Bug Fix", severity_label, severity_index]))
+            result['log'].append("-- Found PR: " + pr_num + " with fix label, Severity of " + str(severity_label))
+            result['counts'].append('merged_fixes')
+            label_matches += 1
+    if "dontknow" in required_tables:
+        if label_matches == 0:
+            result['log'].append("-- Found PR: " + pr_num + " with no matching label")
+            result['rows'].append(('dontknow', [pr_num, pr.title.strip()]))
+            result['counts'].append('dontknow')
+    return result
+
+
+def new_report_tables():
+    """
+    Return the empty (tables, counts) of the report
+    """
+    # rows are sorted on _index (or PR number / notes) when the tables are rendered
+    title_width = {"Title": col_title_width}
+    tables = {
+        'wip_features': render.Table(["PR Number", "Title", "Type", "Notes", "_index"], "_index", ("_index",),
+                                     {"Title": "l"}, title_width),
+        'merged_features': render.Table(["PR Number", "Title", "Type", "Notes", "_index"], "_index", ("_index",),
+                                        {"Title": "l"}, title_width),
+        'merged_fixes': render.Table(["PR Number", "Title", "Type", "Severity", "_index"], "_index", ("_index",),
+                                     {"Title": "l"}, title_width),
+        'dontknow': render.Table(["PR Number", "Title"], "PR Number", (), {"Title": "l"}, title_width),
+        'old_prs': render.Table(["PR Number", "Title", "Type", "Notes", "_index"], "Notes", ("_index",),
+                                {"Title": "l"}, title_width)}
+    return tables, dict.fromkeys(tables, 0)
+
+
+def write_report(tables, counts):
+    """
+    Render the report tables to output_file. It is written aside and moved
+    into place, so the report is never seen half written.
+    """
+    with open(output_file + ".tmp", "w") as file:
+        renderer = render.get_renderer(output_format, file)
+
+        if "wip_features" in required_tables:
+            if counts['wip_features'] > 0:
+                renderer.heading('Work in Progress PRs')
+                renderer.table('wip_features', tables['wip_features'])
+                renderer.note('%s PRs listed' % str(counts['wip_features']))
+
+        if "merged_features" in required_tables:
+            if counts['merged_features'] > 0:
+                renderer.heading('New (merged) Features & Enhancements')
+                renderer.table('merged_features', tables['merged_features'])
+                renderer.note('%s Features listed' % str(counts['merged_features']))
+            else:
+                renderer.note('No new features merged yet for next release.')
+
+        if "merged_fixes" in required_tables:
+            if counts['merged_fixes'] > 0:
+                renderer.heading('Bug Fixes (merged)')
+                renderer.table('merged_fixes', tables['merged_fixes'])
+                renderer.note('%s Bugs listed' % str(counts['merged_fixes']))
+            else:
+                renderer.note('No new fixes merged yet for next release.')
+
+        if "dontknow" in required_tables:
+            if counts['dontknow'] > 0:
+                renderer.heading('Uncategorised Merged PRs')
+                renderer.table('dontknow', tables['dontknow'])
+                renderer.note('%s uncategorised issues listed' % str(counts['dontknow']))
+            else:
+                renderer.note('No Uncategorised PRs to report.')
+
+        if "old_prs" in required_tables:
+            renderer.heading('Old PRs still open')
+            renderer.table('old_prs', tables['old_prs'])
+            renderer.note('%s Old PRs listed' % str(counts['old_prs']))
+    os.replace(output_file + ".tmp", output_file)
+    print("\nTable has been output to %s\n\n" % output_file)
+
+
+def write_labels(label_tables, label_counts):
+    labels_file = os.path.join(os.path.dirname(output_file), "labels")
+    reconcile.write_report(labels_file, repo.full_name, label_tables, label_counts, output_format)
+    print("Label reconciliation tables have been output to %s\n\n" % labels_file)
+
+
+def report_cycle(prs=None, updated_since=None):
+    """
+    One pass of the report: enumerate and classify the PRs, then write the
+    tables (and the label reconciliation). In watch mode `prs` is the
+    PRCollection kept from the previous cycle and only PRs updated since
+    `updated_since` are fetched into it. Returns the collection.
+    """
+    global reverted_shas, release_prs, report, label_report, mirror
+
+    if updated_since is not None:
+        # the first cycle uses the mirror synced for the release lookup
+        with metrics.phase('mirror_sync'):
+            mirror = git_mirror.sync_mirror(repo.clone_url, branch, tmp_repo_dir)
+
+    if use_pr_store:
+        print("Syncing local PR store\n")
+        with metrics.phase('pr_store_sync'):
+            pr_store.sync(store, gh, repo, prev_release_commit_date, fetch_backend, gh_token, pr_base)
+
+    if use_collection:
+        # the report and the label reconciliation are both served from one
+        # fetch of the open PRs and the PRs merged since the last release
+        with metrics.phase('revert_detection'):
+            print("\nFinding reverted PRs")
+            reverted_shas = processors.get_reverted_commits(mirror, branch, prev_release_commit_date, tmp_repo_dir)
+            print("- Found these reverted commits:\n", reverted_shas)
+            release_prs = find_release_prs()
+        print("\nEnumerating open and merged PRs in master\n")
+        with metrics.phase('pr_enumeration'):
+            # a revert landing in a later cycle doesn't touch the reverted PR's
+            # updated_at, so records kept across cycles need their merge commit from the start
+            keep_running = watch_interval > 0 or webhook_port > 0
+            required = ('merge_commit_sha',) if reverted_shas or keep_running else ()
+            if use_pr_store:
+                prs = pr_collection.load_collection(store, store_name, prev_release_commit_date)
+            elif prs is None:
+                merged_since = prev_release_commit_date if release_prs is None else None
+                prs = pr_collection.fetch_collection(gh, repo, merged_since, required, fetch_backend,
+                                                     gh_token, num_workers, pr_base)
+            else:
+                pr_collection.refresh_collection(prs, gh, repo, updated_since, required, fetch_backend,
+                                                 gh_token, num_workers, pr_base)
+
+    print("Enumerating Open WIP PRs in master\n")
+    if use_collection:
+        open_prs = prs.open_prs(label='wip')
+    elif use_pr_store:
+        print("- Reading Pull Requests from the PR store")
+        open_prs = [pr for pr in store.open_prs(store_name) if 'wip' in pr.labels]
+    else:
+        print("- Retrieving Pull Request Issues from Github")
+        search_string = f"{fetch.repo_query(repo, pr_base)} is:open is:pr label:wip"
+        open_prs = fetch.search_prs(gh, repo, search_string, backend=fetch_backend, gh_token=gh_token,
+                                    num_workers=num_workers)
+    print("- Processing OPEN Pull Requests (as issues)\n")
+    # results are kept per PR, so a webhook event only reclassifies the PRs it touches
+    report = report_state.ReportState(new_report_tables)
+    with metrics.phase('open_enumeration'):
+        open_prs = list(open_prs)
+        for pr, result in zip(open_prs, workers.ordered_map(classify_open_pr, open_prs, num_workers)):
+            report.update('open', pr.number, result)
+
+
+    print("\nEnumerating closed and merged PRs in master\n")
+
+    if not use_collection:
+        with metrics.phase('revert_detection'):
+            print("\nFinding reverted PRs")
+            reverted_shas = processors.get_reverted_commits(mirror, branch, prev_release_commit_date, tmp_repo_dir)
+            print("- Found these reverted commits:\n", reverted_shas)
+            release_prs = find_release_prs()
+
+    # the merge commit SHA is not in the REST search payload, only fetch it
+    # when there is something to check it against
+    if release_prs is not None:
+        merged_prs = release_pr_records(prs)
+    elif use_collection:
+        merged_prs = prs.merged_since(prev_release_commit_date)
+    elif use_pr_store:
+        print("- Reading Pull Requests from the PR store")
+        merged_prs = store.merged_since(store_name, prev_release_commit_date)
+    else:
+        print("- Retrieving Pull Request Issues from Github")
+        search_string = f"{fetch.repo_query(repo, pr_base)} is:closed is:pr is:merged merged:>={prev_release_commit_date}"
+        required = ('merge_commit_sha',) if reverted_shas else ()
+        merged_prs = fetch.search_prs(gh, repo, search_string, required, fetch_backend, gh_token, num_workers)
+
+    print("\nProcessing MERGED Pull Request Issues\n")
+    with metrics.phase('merged_enumeration'):
+        merged_prs = list(merged_prs)
+        for pr, result in zip(merged_prs, workers.ordered_map(classify_merged_pr, merged_prs, num_workers)):
+            report.update('merged', pr.number, result)
+
+    if reconcile_labels:
+        print("\nReconciling labels of the same Pull Requests\n")
+        with metrics.phase('label_checks'):
+            label_report = report_state.ReportState(lambda: reconcile.new_tables(col_title_width))
+            open_prs = prs.open_prs()
+            for pr, result in zip(open_prs, workers.ordered_map(reconcile.check_open_pr, open_prs, num_workers)):
+                label_report.update('open', pr.number, result)
+            for pr, result in zip(merged_prs, workers.ordered_map(reconcile.check_merged_pr, merged_prs,
+                                                                  num_workers)):
+                label_report.update('merged', pr.number, result)
+            label_tables, label_counts, label_changes = label_report.tables()
+            plan = label_plan.build_plan(label_changes)
+            label_plan.print_plan(plan, dry_run=not update_labels)
+        if update_labels:
+            with metrics.phase('label_application'):
+                fetch.apply_label_plan(repo, plan, fetch_backend, gh_token, num_workers)
+
+    fetch.print_stats(fetch_backend)
+    gh_client.finish()
+
+    print("\nwriting tables")
+    with metrics.phase('table_rendering'):
+        tables, counts, changes = report.tables()
+        write_report(tables, counts)
+        metrics.record_report(repo=repo.full_name, branch=branch, pr_base=pr_base,
+                              merged_since=prev_release_commit_date, table_rows=counts)
+        if reconcile_labels:
+            write_labels(label_tables, label_counts)
+
+    metrics.write("acs_report_prs", output_file)
+    return prs
+
+
+def find_release_prs():
+    """
+    With "--merged_from":"git", the {number: SHA} of the PRs merged into the
+    branch since the previous release, from the mirror the revert detection
+    just synced. None means the merged PRs come from a search.
+    """
+    if merged_from != 'git':
+        return None
+    found = processors.get_release_prs(mirror, branch, prev_release_sha)
+    if found is None:
+        print("- Previous release commit %s is not in the git mirror, searching for merged PRs instead"
+              % prev_release_sha)
+    return found
+
+
+def add_merged_to_release(prs, events):
+    """
+    With "--merged_from":"git", bring PRs merged into the branch by webhook
+    events into release_prs: the mirror is fetched and walked again, PRs
+    whose merge commit hasn't reached it yet are taken from the event
+    until the next walk finds them
+    """
+    global release_prs, mirror
+    merged = set()
+    for event, payload in events:
+        pull = payload.get('pull_request') or {}
+        if event == 'pull_request' and pull.get('merged_at') and \
+                (pull.get('base') or {}).get('ref', branch) == branch and pull['number'] in prs.prs:
+            merged.add(pull['number'])
+    if not merged - set(release_prs):
+        return
+    with metrics.phase('mirror_sync'):
+        mirror = git_mirror.sync_mirror(repo.clone_url, branch, tmp_repo_dir)
+    found = processors.get_release_prs(mirror, branch, prev_release_sha)
+    if found is not None:
+        release_prs = found
+    for number in merged - set(release_prs):
+        print("- PR %s is merged but not in the git mirror yet, adding it from its event" % number)
+        release_prs[number] = prs.prs[number].merge_commit_sha
+
+
+def release_pr_records(prs):
+    """
+    The records of the PRs in release_prs, newest first. PRs already held
+    (in the collection or the PR store) are used as they are, only the rest
+    are fetched, by number, and kept for the next cycle.
+    """
+    if use_collection:
+        held = dict((number, prs.prs[number]) for number in release_prs if number in prs.prs)
+    elif use_pr_store:
+        held = dict((pr.number, pr) for pr in store.get_prs(store_name, release_prs))
+    else:
+        held = {}
+    missing = sorted(set(release_prs) - set(held), reverse=True)
+    print("- %s merged PRs already held, fetching %s by number" % (len(held), len(missing)))
+    fetched = list(fetch.get_pr_records(repo, missing, fetch_backend, gh_token, num_workers))
+    if use_collection:
+        prs.add(fetched)
+    elif use_pr_store:
+        store.upsert(store_name, fetched)
+    held.update((pr.number, pr) for pr in fetched)
+    return [held[number] for number in sorted(held, reverse=True)]
+
+
+def reclassify(prs, number):
+    """
+    Replace the report (and label check) results of one PR after it changed
+    """
+    report.discard(number)
+    if reconcile_labels:
+        label_report.discard(number)
+    pr = prs.prs.get(number)
+    if pr is None:
+        return
+    if pr.state == 'open':
+        if 'wip' in pr.labels:
+            report.update('open', number, classify_open_pr(pr))
+        if reconcile_labels:
+            label_report.update('open', number, reconcile.check_open_pr(pr))
+    elif (number in release_prs) if release_prs is not None else \
+            (pr.merged_at is not None and pr.merged_at >= datetime.strptime(prev_release_commit_date, '%Y-%m-%d')):
+        report.update('merged', number, classify_merged_pr(pr))
+        if reconcile_labels:
+            label_report.update('merged', number, reconcile.check_merged_pr(pr))
+
+
+def apply_events(prs, events):
+    """
+    Apply a batch of webhook events to the PRs held in memory, reclassify
+    just the PRs they touched, queue their label fixes and rewrite the report
+    """
+    changed = set()
+    with metrics.phase('webhook_events'):
+        for event, payload in events:
+            changed |= webhooks.apply_event(prs, event, payload, pr_base)
+        if release_prs is not None:
+            add_merged_to_release(prs, events)
+        for number in sorted(changed):
+            reclassify(prs, number)
+    print("- Applied %s webhook events, %s PRs changed" % (len(events), len(changed)))
+    if not changed:
+        return
+    with metrics.phase('table_rendering'):
+        tables, counts, changes = report.tables()
+        write_report(tables, counts)
+        if reconcile_labels:
+            label_tables, label_counts, label_changes = label_report.tables(changed)
+            write_labels(label_tables, label_counts)
+    if reconcile_labels:
+        plan = label_plan.build_plan(label_changes)
+        label_plan.print_plan(plan, dry_run=not update_labels)
+        if update_labels:
+            with metrics.phase('label_application'):
+                fetch.apply_label_plan(repo, plan, fetch_backend, gh_token, num_workers)
+    metrics.write("acs_report_prs", output_file)
+
 
 # run the code...
 if __name__ == '__main__':
@@ -118,7 +555,7 @@ if __name__ == '__main__':
     except:
         prev_release_commit_sha = "NULL"
 
-    if prev_release_commit_sha == "NULL" and prev_release_ver == "NULL":
+    if prev_release_commit_sha in ("NULL", "") and prev_release_ver in ("NULL", ""):
         print("Starting commit SHA or version is required to continue")
         sys.exit()
 
@@ -171,7 +608,68 @@ if __name__ == '__main__':
     except:
         destination = "/opt"
 
-    tmp_dir="/tmp"
+    try:
+        fetch_backend = str(args['--fetch_backend'])
+    except:
+        fetch_backend = "rest"
+    if fetch_backend not in fetch.BACKENDS:
+        print("Unknown fetch backend '%s', expected one of %s" % (fetch_backend, ', '.join(fetch.BACKENDS)))
+        sys.exit()
+
+    try:
+        use_pr_store = str(args['--pr_store']).lower() == "true"
+    except:
+        use_pr_store = bool(False)
+
+    try:
+        num_workers = int(args['--workers'])
+    except:
+        num_workers = 1
+
+    try:
+        output_format = str(args['--output_format'])
+    except:
+        output_format = "rst"
+    if output_format not in render.FORMATS:
+        print("Unknown output format '%s', expected one of %s" % (output_format, ', '.join(render.FORMATS)))
+        sys.exit()
+
+    try:
+        watch_interval = int(args['--watch'])
+    except:
+        watch_interval = 0
+
+    try:
+        webhook_port = int(args['--webhook_port'])
+    except:
+        webhook_port = 0
+    try:
+        webhook_secret = str(args['--webhook_secret'])
+    except:
+        webhook_secret = ""
+    if webhook_port and webhook_secret in ("", "None"):
+        print("A --webhook_secret is required to receive webhook events")
+        sys.exit()
+
+    try:
+        reconcile_labels = str(args['--reconcile_labels']).lower() == "true"
+    except:
+        reconcile_labels = bool(False)
+
+    try:
+        update_labels = str(args['--update_labels']).lower() == "true"
+    except:
+        update_labels = bool(False)
+
+    try:
+        use_http_cache = str(args['--http_cache']).lower() != "false"
+    except:
+        use_http_cache = bool(True)
+
+    try:
+        tmp_dir = str(args['--tmp_dir'])
+    except:
+        tmp_dir = "/tmp"
     if docker_created_config:
         tmp_tmp_dir =  str(tmp_dir + "/docker_output")
         try:
@@ -187,198 +685,112 @@ if __name__ == '__main__':
             print ("Successfully created empty output directory %s " % tmp_tmp_dir)
             os.remove(str(args['--config']))
 
-    tmp_repo_dir = str(tmp_dir) + "/repo"   
-    
-    gh = Github(gh_token)
+    try:
+        tmp_repo_dir = str(args['--mirror_dir'] or tmp_dir + "/repo")
+    except:
+        tmp_repo_dir = str(tmp_dir) + "/repo"
 
-    wip_features_table = PrettyTable(["PR Number", "Title", "Type", "Notes", "_index"])
-    fixes_table = PrettyTable(["PR Number", "Title", "Type", "Severity", "_index"]) 
-    features_table = PrettyTable(["PR Number", "Title", "Type", "Notes", "_index"])
-    dontknow_table = PrettyTable(["PR Number", "Title"])
-    old_pr_table = PrettyTable(["PR Number", "Title", "Type", "Notes", "_index"])
-    old_pr_table.align["Title"] = "l"
-    wip_features_table.align["Title"] = "l"
-    features_table.align["Title"] = "l"
-    fixes_table.align["Title"] = "l"
-    dontknow_table.align["Title"] = "l"
-    old_pr_table._max_width = {"Title":col_title_width}
-    wip_features_table._max_width = {"Title":col_title_width}
-    features_table._max_width = {"Title":col_title_width}
-    fixes_table._max_width = {"Title":col_title_width}
-    dontknow_table._max_width = {"Title":col_title_width}
+    try:
+        pr_base = args['--pr_base'] or None
+    except:
+        pr_base = None
 
-    repo = gh.get_repo(repo_name)
+    try:
+        merged_from = str(args['--merged_from'] or "search")
+    except:
+        merged_from = "search"
+    if merged_from not in ("search", "git"):
+        print("Unknown --merged_from '%s', expected 'search' or 'git'" % merged_from)
+        sys.exit()
+    release_prs = None
 
-    ## TODO - get commit -> commit date from tag on master.
-    ## Searching seems a waste
+    try:
+        profile_run = str(args['--profile']).lower() == "true"
+    except:
+        profile_run = bool(False)
+    if profile_run:
+        profiling.start(tmp_tmp_dir if docker_created_config else destination, "acs_report_prs")
+    
+    try:
+        gh_api_url = str(args['--gh_api_url'])
+    except:
+        gh_api_url = gh_client.API_URL
 
-    #repo_tags = repo.get_tags()
+    # several reports run together (see acs_report_targets.py) share one rate limit budget
+    gh = gh_client.get_github(gh_token, tmp_dir, use_http_cache, gh_api_url, args.get('--rate_limit_server'),
+                              args.get('--rate_limit_key'))
 
+    with metrics.phase('repo_lookup'):
+        repo = gh.get_repo(repo_name)
 
-    if prev_release_commit_sha != "NULL":
+    # the release is resolved from the tags in the git mirror (kept for revert
+    # detection anyway) through an index next to it, the API only for what the mirror lacks
+    with metrics.phase('mirror_sync'):
+        mirror = git_mirror.sync_mirror(repo.clone_url, branch, tmp_repo_dir)
+    if prev_release_commit_sha not in ("NULL", "", None):
         print("Previous Release Commit SHA found in conf file, skipping pre release SHA search.\n")
-        prev_release_sha = prev_release_commit_sha
     else:
-        print("Finding commit SHA for previous version " + prev_release_ver)
-        for tag in repo_tags:
-            if tag.name == prev_release_ver:
-                prev_release_sha = tag.commit.sha
-
-    commit = repo.get_commit(sha=prev_release_sha)
-    prev_release_commit_date=str(commit.commit.author.date.date())
-    if not commit:
-        print("No starting point found via version tag or commit SHA")
-        exit
-
-    print("Enumerating Open WIP PRs in master\n")
-    print("- Retrieving Pull Request Issues from Github")
-    search_string = f"repo:apache/cloudstack is:open is:pr label:wip"
-    issues = gh.search_issues(search_string)
-    wip_features = 0
-    old_prs = 0
-
-    print("- Processing OPEN Pull Requests (as issues)\n")
-    for issue in issues:
-        pr = issue.repository.get_pull(issue.number)
-        label = []
-        pr_num = str(pr.number)
-        labels = pr.labels
-        if "wip_features" in required_tables:
-            if [l.name for l in labels if l.name=='wip']:
-                wip_features_table.add_row([pr_num, pr.title.strip(), "-", "-", 1]) 
-                print("-- Found open PR : " + pr_num + " with WIP label")
-                wip_features += 1
-        if "old_prs" in required_tables:
-            creation_date = pr.created_at
-            check_date_old = datetime.now() - timedelta(days=365)
-            check_date_very_old = datetime.now() - timedelta(days=2*365)
-            if creation_date < check_date_very_old:
-                print("**** More than 2 years old")
-                old_prs += 1
-                old_pr_table.add_row([pr_num, pr.title.strip(), "Very old PR", "Add label age:2years_plus", 2])
-
-            elif creation_date < check_date_old:
-                print("**** More than 1 year old")
-                old_prs += 1
-                old_pr_table.add_row([pr_num, pr.title.strip(), "Old PR", "Add label age:1year_plus", 1])
-
-
-    print("\nEnumerating closed and merged PRs in master\n")
-
-    print("- Retrieving Pull Request Issues from Github")
-    search_string = f"repo:apache/cloudstack is:closed is:pr is:merged merged:>={prev_release_commit_date}"
-    issues = gh.search_issues(search_string)
-    features = 0
-    fixes = 0
-    uncategorised = 0
-
-    print("\nFinding reverted PRs")
-    reverted_shas = processors.get_reverted_commits(repo, branch,prev_release_commit_date, tmp_repo_dir)
-    print("- Found these reverted commits:\n", reverted_shas)
-
-    print("\nProcessing MERGED Pull Request Issues\n")
-    for issue in issues:
-        label_matches = 0
-        pr = issue.repository.get_pull(issue.number)
-        pr_commit_sha = pr.merge_commit_sha
-        if pr_commit_sha in reverted_shas:
-            print("- Skipping PR %s, its been reverted", pr.merge_commit_sha)
-        else:
-            label = []
-            severity_label = []
-            pr_num = str(pr.number)
-            labels = pr.labels
-            severity_label_match = 0
-            severity_label_test = ''
-
-            for l in labels:
-                severity_label_test = l.name.find("Severity")
-                if int(severity_label_test) != -1:
-                    severity_label = l.name[9:]
-                    severity_label_match += 1 
-            if severity_label_match != 1:
-                severity_label = "unmatched"
-            
-            index_dict = {"BLOCKER":"01","Critical":"02", "Major":"03", "Minor":"04", "Trivial":"05", "none":"98", "unmatched":"99"}
-
-            severity_index = index_dict[severity_label]
-
-            if "merged_features" in required_tables:
-                if [l.name for l in labels if l.name=='type:new-feature' or l.name=='type:new_feature']:
-                    features_table.add_row([pr_num, pr.title.strip(), "New Feature", "-", 1 ]) 
-                    print("-- Found PR: " + pr_num + " with feature label")
-                    features += 1
-                    label_matches += 1
-            if "merged_features" in required_tables:
-                if [l.name for l in labels if l.name=='type:enhancement']:
-                    features_table.add_row([pr_num, pr.title.strip(), "Enhancement", "-", 2]) 
-                    print("-- Found PR: " + pr_num + " with enhancement label")
-                    features += 1
-                    label_matches += 1
-            if "merged_fixes" in required_tables:
-                if [l.name for l in labels if l.name == 'type:bug' or l.name == 'type:cleanup']:
-                    fixes_table.add_row([pr_num, pr.title.strip(), "Bug Fix", severity_label, severity_index]) 
-                    print("-- Found PR: " + pr_num + " with fix label, Severity of " + str(severity_label))
-                    fixes += 1
-                    label_matches += 1
-            if "dontknow" in required_tables:
-                if label_matches == 0:
-                    print("-- Found PR: " + pr_num + " with no matching label")
-                    dontknow_table.add_row([pr_num, pr.title.strip()])
-                    uncategorised += 1
+        prev_release_commit_sha = None
+    with metrics.phase('release_commit_lookup'):
+        try:
+            prev_release_sha, prev_release_commit_date = tag_index.resolve_release(
+                repo, tmp_repo_dir, prev_release_ver, prev_release_commit_sha, mirror)
+        except GithubException as e:
+            print("No starting point found via version tag or commit SHA: %s" % str(e))
+            sys.exit()
 
-    print("\nwriting tables")
+    if use_pr_store:
+        store = pr_store.PRStore(os.path.join(tmp_dir, pr_store.STORE_FILE_NAME))
+        store_name = pr_store.store_key(repo.full_name, pr_base)
 
     if docker_created_config:
         output_file = str(tmp_tmp_dir + "/" + output_file_name)
     else:
         output_file = str(destination + "/" + output_file_name)
 
-    with open(output_file ,"w") as file:
-
-        if "wip_features" in required_tables:
-            if wip_features > 0:
-                wip_features_table.sortby = "_index"
-                wip_features_table_txt = wip_features_table.get_string(fields=["PR Number", "Title", "Type", "Notes"])
-                file.write('\nWork in Progress PRs\n\n')
-                file.write(wip_features_table_txt)
-                file.write('\n%s PRs listed\n\n' % str(wip_features))
-
-        if "merged_features" in required_tables:
-            if features > 0:
-                features_table.sortby = "_index"
-                features_table_txt = features_table.get_string(fields=["PR Number", "Title", "Type", "Notes"])
-                file.write('New (merged) Features & Enhancements\n\n')
-                file.write(features_table_txt)
-                file.write('\n%s Features listed\n\n' % str(features))
-            else:
-                file.write('No new features merged yet for next release.\n\n')
-
-        if "merged_fixes" in required_tables:
-            if fixes > 0:
-                fixes_table.sortby = "_index"
-                fixes_table_txt = fixes_table.get_string(fields=["PR Number", "Title", "Type", "Severity"])
-                file.write('Bug Fixes (merged)\n\n')        
-                file.write(fixes_table_txt)
-                file.write('\n%s Bugs listed\n\n' % str(fixes))
-            else:
-                file.write('No new fixes merged yet for next release.\n\n')
-
-        if "dontknow" in required_tables:
-            if uncategorised > 0:
-                dontknow_table.sortby = "PR Number"
-                dontknow_table_txt = dontknow_table.get_string(fields=["PR Number", "Title"])
-                file.write('Uncategorised Merged PRs\n\n')
-                file.write(dontknow_table_txt)
-                file.write('\n%s uncategorised issues listed\n\n' % str(uncategorised))
-            else:
-                file.write('No Uncategorised PRs to report.\n\n')
-
-        if "old_prs" in required_tables:
-            old_pr_table.sortby = "Notes"
-            old_pr_txt = old_pr_table.get_string(fields=["PR Number", "Title", "Type", "Notes"])
-            file.write('Old PRs still open\n\n')
-            file.write(old_pr_txt)
-            file.write('\n%s Old PRs listed\n\n' % str(old_prs))
-    file.close()
-    print("\nTable has been output to %s\n\n" % output_file)
+    # in watch mode the Github client (and its HTTP cache), the git mirror
+    # and the PR set stay warm, each cycle only asks for PRs updated since the
+    # last. Webhook events are applied to the same PR set between cycles.
+    use_collection = reconcile_labels or watch_interval > 0 or webhook_port > 0
+    receiver = None
+    if webhook_port:
+        # listen before the first crawl, events arriving during it wait in the queue
+        receiver = webhooks.WebhookReceiver(webhook_secret, webhook_port).start()
+    prs = None
+    last_refresh = None
+    while True:
+        cycle_started = time.monotonic()
+        refresh_started = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        try:
+            prs = report_cycle(prs, last_refresh)
+            last_refresh = refresh_started
+        except Exception as e:
+            if not watch_interval:
+                raise
+            print("ERROR: refresh failed, trying again next cycle: %s" % str(e))
+        if not watch_interval and receiver is None:
+            break
+        next_cycle = cycle_started + watch_interval if watch_interval else None
+        if prs is None and next_cycle is None:
+            # the first crawl failed, there is nothing to apply events to yet
+            next_cycle = cycle_started + 60
+        if next_cycle is not None:
+            print("\nWatching %s, next refresh in %.0fs\n" % (repo.full_name, next_cycle - time.monotonic()))
+        else:
+            print("\nWatching %s for webhook events\n" % repo.full_name)
+        while next_cycle is None or time.monotonic() < next_cycle:
+            timeout = None if next_cycle is None else max(0, next_cycle - time.monotonic())
+            if receiver is None or prs is None:
+                time.sleep(timeout)
+                break
+            events = receiver.next_events(timeout)
+            if events:
+                metrics.reset()
+                try:
+                    apply_events(prs, events)
+                except Exception as e:
+                    print("ERROR: applying webhook events failed: %s" % str(e))
+        metrics.reset()
+
+    if use_pr_store:
+        store.close()
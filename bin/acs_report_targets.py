@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Usage:
+  acs_report_targets.py --config=<config.json>
+  acs_report_targets.py (-h | --help)
+
+Runs acs_report_prs.py for several repo/branch/release targets at once, each
+in its own process, and writes one report per target plus a combined summary.
+
+Sample json file contents:
+
+{
+	"--gh_token":"************",
+	"--tmp_dir":"/tmp/trawler",
+	"--destination":"/opt/reports",
+	"--processes":"2",
+	"--targets": [
+		{"--repo":"apache/cloudstack", "--branch":"main", "--prev_release_commit_sha":"************"},
+		{"--repo":"apache/cloudstack", "--branch":"4.19", "--pr_base":"4.19",
+		 "--prev_release_commit_sha":"************"}
+	]
+}
+
+Every other key is passed to each target as it is, and a target's own keys
+win over them (see acs_report_prs.py for the options).
+
+    "--processes":"2"                    how many targets run at the same time (default: all of them)
+
+    All targets share one rate limit budget, served from this process, and
+    the targets of one repo share one git mirror under <tmp_dir>/mirrors.
+    Each target keeps its own caches under <tmp_dir>/targets/<target> and
+    writes <target>.<format> (unless it sets "--output_file_name") and a
+    <target>.log to --destination. The combined summary is written there as
+    summary.<format>. --watch and --webhook_port are not passed on.
+    Only acs_report_prs.py is run per target; acs_github_label_reconciler.py
+    takes one --branch and is run on its own.
+
+requires: python3.8 + docopt pygithub prettytable pygit2 + git
+"""
+
+import docopt
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from lib import rate_limit
+from lib import render
+
+BIN_DIR = os.path.dirname(os.path.abspath(__file__))
+EXTENSIONS = {'rst': 'rst', 'markdown': 'md', 'csv': 'csv', 'json': 'jsonl'}
+# options that keep a report running, a target has to finish for the summary
+LONG_RUNNING = ('--watch', '--webhook_port', '--webhook_secret')
+RUNNER_ONLY = ('--targets', '--processes', '--config')
+
+
+def target_slug(target):
+    """
+    A file name friendly name for a target: owner_name_branch[_base]
+    """
+    parts = [target.get('--repo', 'apache/cloudstack'), target.get('--branch', 'master')]
+    if target.get('--pr_base'):
+        parts.append(target['--pr_base'])
+    return re.sub(r'[^A-Za-z0-9.-]+', '_', '_'.join(parts))
+
+
+def target_config(args, target, shared_address, shared_key):
+    """
+    The acs_report_prs.py config of one target: the shared options, then the target's own
+    """
+    tmp_dir = str(args.get('--tmp_dir') or "/tmp")
+    slug = target_slug(target)
+    config = dict((key, value) for key, value in args.items()
+                  if key not in RUNNER_ONLY + LONG_RUNNING and value is not None)
+    config.update(dict((key, value) for key, value in target.items() if key not in LONG_RUNNING))
+    repo = config.setdefault('--repo', 'apache/cloudstack')
+    output_format = str(config.get('--output_format') or "rst")
+    config.setdefault('--output_file_name', "%s.%s" % (slug, EXTENSIONS.get(output_format, output_format)))
+    config.setdefault('--mirror_dir', os.path.join(tmp_dir, "mirrors", repo.replace('/', '_')))
+    config['--tmp_dir'] = os.path.join(tmp_dir, "targets", slug)
+    config['--rate_limit_server'] = shared_address
+    config['--rate_limit_key'] = shared_key
+    return slug, config
+
+
+def run_target(slug, config, destination):
+    """
+    Run acs_report_prs.py for one target to completion, returns its summary row values
+    """
+    os.makedirs(config['--tmp_dir'], exist_ok=True)
+    config_file = os.path.join(config['--tmp_dir'], "config.json")
+    with open(config_file, "w") as conf:
+        json.dump(config, conf, indent=4)
+    log_file = os.path.join(destination, slug + ".log")
+    print("- Starting %s, logging to %s" % (slug, log_file))
+    start = time.perf_counter()
+    with open(log_file, "w") as log:
+        returncode = subprocess.call([sys.executable, os.path.join(BIN_DIR, "acs_report_prs.py"),
+                                      "--config=" + config_file], stdout=log, stderr=subprocess.STDOUT)
+    wall = time.perf_counter() - start
+    print("- Finished %s in %.1fs, exit code %s" % (slug, wall, returncode))
+    summary = {}
+    metrics_file = os.path.splitext(os.path.join(destination, config['--output_file_name']))[0] + ".metrics.json"
+    if returncode == 0 and os.path.isfile(metrics_file):
+        with open(metrics_file) as summary_file:
+            summary = json.load(summary_file)
+    return {'slug': slug, 'config': config, 'returncode': returncode, 'seconds': wall, 'summary': summary}
+
+
+def write_summary(results, destination, output_format):
+    """
+    Write one row per target: what it reported on, its table sizes, API calls and time
+    """
+    table_names = []
+    for result in results:
+        for name in result['summary'].get('report', {}).get('table_rows', {}):
+            if name not in table_names:
+                table_names.append(name)
+    table = render.Table(['Target', 'Repo', 'Branch', 'Since'] + table_names + ['API Calls', 'Seconds', 'Exit Code'],
+                         align={'Target': 'l'})
+    for result in results:
+        report = result['summary'].get('report', {})
+        table.add_row([result['slug'], result['config']['--repo'], result['config'].get('--branch', 'master'),
+                       report.get('merged_since', '-')] +
+                      [report.get('table_rows', {}).get(name, '-') for name in table_names] +
+                      [result['summary'].get('requests_total', '-'), round(result['seconds'], 1),
+                       result['returncode']])
+    summary_file = os.path.join(destination, "summary." + EXTENSIONS.get(output_format, output_format))
+    with open(summary_file + ".tmp", "w") as out:
+        renderer = render.get_renderer(output_format, out)
+        renderer.title("Report targets")
+        renderer.table('summary', table)
+    os.replace(summary_file + ".tmp", summary_file)
+    print("\nSummary written to %s" % summary_file)
+
+
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+    try:
+        with open(args['--config']) as json_file:
+            args.update(json.load(json_file))
+    except Exception as e:
+        print("Failed to load config file '%s'" % args['--config'])
+        sys.exit("ERROR: %s" % str(e))
+
+    targets = args.get('--targets') or []
+    if not targets:
+        sys.exit("ERROR: --targets must list at least one target")
+    try:
+        processes = int(args['--processes'])
+    except:
+        processes = len(targets)
+    try:
+        destination = str(args['--destination'])
+    except:
+        destination = "/opt"
+    try:
+        output_format = str(args['--output_format'] or "rst")
+    except:
+        output_format = "rst"
+    if output_format not in render.FORMATS:
+        sys.exit("Unknown output format '%s', expected one of %s" % (output_format, ', '.join(render.FORMATS)))
+
+    # the reports draw on one budget, paced here, rather than each on all of it
+    scheduler, address, authkey = rate_limit.serve_shared(rate_limit.split_tokens(args.get('--gh_token')))
+    configs = [target_config(args, target, address, authkey) for target in targets]
+    slugs = [slug for slug, config in configs]
+    if len(set(slugs)) != len(slugs):
+        sys.exit("ERROR: targets must differ in repo, branch or pr_base")
+    os.makedirs(destination, exist_ok=True)
+    print("Running %s targets, %s at a time\n" % (len(configs), processes))
+    with ThreadPoolExecutor(max_workers=max(processes, 1)) as pool:
+        results = list(pool.map(lambda slug_config: run_target(slug_config[0], slug_config[1], destination),
+                                configs))
+
+    scheduler.print_stats()
+    write_summary(results, destination, output_format)
+    failed = [result['slug'] for result in results if result['returncode'] != 0]
+    if failed:
+        print("Failed targets: %s" % ', '.join(failed))
+    sys.exit(1 if failed else 0)
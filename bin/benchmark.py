@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Usage:
+  benchmark.py [--sizes=<arg>] [--scripts=<arg>] [--fetch_backend=<arg>] [--workers=<arg>]
+               [--latency=<arg>] [--rate_limits=<arg>] [--fixture=<arg>] [--bases=<arg>] [--passes=<arg>]
+               [--tmp_dir=<arg>] [--output=<arg>] [--output_format=<arg>]
+  benchmark.py (-h | --help)
+
+Runs acs_report_prs.py and the label reconciler against a local stub of the
+Github API (lib/stub_server.py) and a synthetic git history, so no token or
+network is needed. Prints wall time, peak memory and API calls by endpoint
+for every run, and how many of them the stub answered 304 from an
+unchanged ETag. The default sizes take about 25 minutes, nearly all of it
+the 50k report (some 11.5k calls at the default latency). With rate limits
+set to 'github' the runs are paced like real ones, so anything past
+Github's 5000 calls an hour waits for the next hour.
+
+Options:
+  -h --help                 Show this screen.
+  --sizes=<arg>             Comma separated numbers of synthetic PRs [default: 1000,10000,50000].
+  --scripts=<arg>           Comma separated scripts to run: report, reconciler [default: report,reconciler].
+  --fetch_backend=<arg>     'rest', 'graphql' or 'async' [default: rest].
+  --workers=<arg>           --workers passed to the scripts [default: 1].
+  --latency=<arg>           Seconds the stub holds back each response [default: 0.05].
+  --rate_limits=<arg>       'github' to charge requests against Github's limits, 'off' to leave
+                              rate limit headers out [default: off].
+  --fixture=<arg>           Serve PRs recorded with stub_server.record_fixture() instead of synthetic ones.
+  --bases=<arg>             Comma separated branches the synthetic PRs target. The report covers the
+                              first one, and filters on it with --pr_base when there are several
+                              [default: master].
+  --passes=<arg>            Run each script this many times over the same caches, so the later passes
+                              show the conditional request (ETag) cache at work [default: 1].
+  --tmp_dir=<arg>           Directory for the runs' caches, repos and reports (default: a new temp dir).
+  --output=<arg>            Also write the results as JSON to this file, to compare runs.
+  --output_format=<arg>     --output_format passed to the scripts: rst, markdown, csv or json [default: rst].
+
+requires: python3.8 + docopt pygithub prettytable pygit2 (+ aiohttp for the async backend) + git
+"""
+
+import docopt
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from prettytable import PrettyTable
+from lib import stub_server
+
+SCRIPTS = {'report': 'acs_report_prs.py', 'reconciler': 'acs_github_label_reconciler.py'}
+BIN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_config(run_dir, stub, args):
+    """
+    Write the config file both scripts read for one run, returns its path
+    """
+    config = {
+        "--gh_token": "stub-token",
+        "--prev_release_commit_sha": "0" * 40,
+        "--prev_release_ver": "",
+        "--repo": stub.repo_name,
+        "--branch": args['--bases'].split(',')[0],
+        "--gh_api_url": stub.url,
+        "--tmp_dir": os.path.join(run_dir, "tmp"),
+        "--destination": run_dir,
+        "--output_file_name": "prs.rst",
+        "--fetch_backend": args['--fetch_backend'],
+        "--workers": args['--workers'],
+        "--output_format": args['--output_format'],
+    }
+    if ',' in args['--bases']:
+        config["--pr_base"] = config["--branch"]
+    os.makedirs(config["--tmp_dir"])
+    config_file = os.path.join(run_dir, "conf.json")
+    with open(config_file, "w") as file:
+        json.dump(config, file, indent=4)
+    return config_file
+
+
+def run_script(script, config_file, run_dir, run_pass=1):
+    """
+    Run one trawler script to completion, returns (wall seconds, peak RSS in MB, exit code)
+    """
+    log_file = os.path.join(run_dir, "%s.%s.log" % (script, run_pass))
+    with open(log_file, "w") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(BIN_DIR, SCRIPTS[script]),
+                                    "--config=" + config_file], stdout=log, stderr=subprocess.STDOUT, cwd=run_dir)
+        pid, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+    returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    process.returncode = returncode
+    if returncode != 0:
+        print("- %s exited with %s, see %s" % (script, returncode, log_file))
+    # ru_maxrss is in kilobytes on Linux
+    return wall, usage.ru_maxrss / 1024.0, returncode
+
+
+def benchmark(name, prs, args, tmp_dir):
+    """
+    Serve `prs` from a stub and run each requested script against it
+    """
+    results = []
+    base_dir = os.path.join(tmp_dir, name)
+    os.makedirs(base_dir)
+    print("\nPreparing '%s': %s PRs" % (name, len(prs)))
+    reverted = stub_server.synthetic_git_repo(prs, os.path.join(base_dir, "origin.git"),
+                                              branch=args['--bases'].split(',')[0])
+    rate_limits = stub_server.RATE_LIMITS if args['--rate_limits'] == 'github' else None
+    stub = stub_server.StubGithubServer(prs, clone_url=os.path.join(base_dir, "origin.git"),
+                                        latency=float(args['--latency']), rate_limits=rate_limits).start()
+    try:
+        for script in args['--scripts'].split(','):
+            run_dir = os.path.join(base_dir, script)
+            os.makedirs(run_dir)
+            config_file = run_config(run_dir, stub, args)
+            for run_pass in range(1, int(args['--passes']) + 1):
+                stub.reset_calls()
+                print("- Running %s, pass %s" % (script, run_pass))
+                wall, peak_mb, returncode = run_script(script, config_file, run_dir, run_pass)
+                calls = dict(stub.calls)
+                results.append({'name': name, 'prs': len(prs), 'reverted': len(reverted), 'script': script,
+                                'pass': run_pass, 'backend': args['--fetch_backend'],
+                                'workers': int(args['--workers']), 'wall_seconds': round(wall, 2),
+                                'peak_rss_mb': round(peak_mb, 1), 'api_calls': sum(calls.values()),
+                                'not_modified': stub.not_modified, 'calls_by_endpoint': calls,
+                                'exit_code': returncode})
+    finally:
+        stub.stop()
+    return results
+
+
+def print_results(results):
+    table = PrettyTable(["Run", "PRs", "Script", "Pass", "Backend", "Workers", "Wall (s)", "Peak RSS (MB)",
+                         "API calls", "304s", "Calls by endpoint"])
+    table.align["Calls by endpoint"] = "l"
+    for result in results:
+        table.add_row([result['name'], result['prs'], result['script'], result['pass'], result['backend'],
+                       result['workers'], result['wall_seconds'], result['peak_rss_mb'], result['api_calls'],
+                       result['not_modified'],
+                       ', '.join("%s=%s" % item for item in sorted(result['calls_by_endpoint'].items()))])
+    print(table.get_string())
+
+
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+    tmp_dir = args['--tmp_dir'] or tempfile.mkdtemp(prefix="trawler-bench-")
+    print("Benchmark runs are kept under %s" % tmp_dir)
+
+    results = []
+    if args['--fixture']:
+        results += benchmark("fixture", stub_server.load_fixture(args['--fixture']), args, tmp_dir)
+    else:
+        for size in args['--sizes'].split(','):
+            results += benchmark("synthetic-%s" % size, stub_server.synthetic_prs(int(size), bases=tuple(args['--bases'].split(','))), args, tmp_dir)
+
+    print("")
+    print_results(results)
+    if args['--output']:
+        with open(args['--output'], "w") as file:
+            json.dump(results, file, indent=4)
+        print("\nResults written to %s" % args['--output'])
+    sys.exit(1 if any(result['exit_code'] for result in results) else 0)
@@ -56,7 +56,7 @@ with open(config_file ,"w") as file:
         tmp_dir = os.environ.get('tmp_dir')
         file.write('    "--tmp_dir":"' + str(tmp_dir) + '",\n')
     else:
-        file.write('    "--tmp_dir":"/tmp,"\n')
+        file.write('    "--tmp_dir":"/tmp",\n')
 
     if 'destination' in os.environ:
         destination = os.environ.get('destination')
@@ -74,6 +74,46 @@ with open(config_file ,"w") as file:
         update_labels = os.environ.get('update_labels')
         file.write('    "--update_labels":"' + str(update_labels) + '",\n')
      
+    if 'fetch_backend' in os.environ:
+        fetch_backend = os.environ.get('fetch_backend')
+        file.write('    "--fetch_backend":"' + str(fetch_backend) + '",\n')
+
+    if 'pr_store' in os.environ:
+        pr_store = os.environ.get('pr_store')
+        file.write('    "--pr_store":"' + str(pr_store) + '",\n')
+
+    if 'http_cache' in os.environ:
+        http_cache = os.environ.get('http_cache')
+        file.write('    "--http_cache":"' + str(http_cache) + '",\n')
+
+    if 'reconcile_labels' in os.environ:
+        reconcile_labels = os.environ.get('reconcile_labels')
+        file.write('    "--reconcile_labels":"' + str(reconcile_labels) + '",\n')
+
+    if 'output_format' in os.environ:
+        output_format = os.environ.get('output_format')
+        file.write('    "--output_format":"' + str(output_format) + '",\n')
+
+    if 'watch' in os.environ:
+        watch = os.environ.get('watch')
+        file.write('    "--watch":"' + str(watch) + '",\n')
+
+    if 'webhook_port' in os.environ:
+        webhook_port = os.environ.get('webhook_port')
+        file.write('    "--webhook_port":"' + str(webhook_port) + '",\n')
+
+    if 'webhook_secret' in os.environ:
+        webhook_secret = os.environ.get('webhook_secret')
+        file.write('    "--webhook_secret":"' + str(webhook_secret) + '",\n')
+
+    if 'profile' in os.environ:
+        profile = os.environ.get('profile')
+        file.write('    "--profile":"' + str(profile) + '",\n')
+
+    if 'workers' in os.environ:
+        workers = os.environ.get('workers')
+        file.write('    "--workers":"' + str(workers) + '",\n')
+
     file.write('    "--docker_created_config":"True"')
     file.write('\n}\n   ')   
     file.close()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import json
+from lib import metrics
+from lib import pulls
+from lib import rate_limit
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+API_URL = "https://api.github.com"
+SEARCH_PAGE_SIZE = 100
+# the search API stops at 1000 results
+SEARCH_MAX_PAGES = 10
+DEFAULT_CONCURRENCY = 100
+
+request_stats = {'requests': 0}
+
+
+class AsyncGithubError(Exception):
+    pass
+
+
+class AsyncGithub:
+    """
+    Minimal asyncio Github REST client for the calls the trawler makes:
+    search pages, pull details and label changes. All requests share one
+    keep-alive connection pool, at most `concurrency` in flight at a time.
+    """
+
+    def __init__(self, gh_token, api_url=API_URL, concurrency=DEFAULT_CONCURRENCY):
+        if aiohttp is None:
+            raise AsyncGithubError("the async backend needs aiohttp (pip install aiohttp)")
+        self.gh_token = gh_token
+        self.api_url = api_url.rstrip('/')
+        self.concurrency = concurrency
+        self.session = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(connector=connector, headers={
+            'Accept': 'application/vnd.github+json',
+            'User-Agent': 'acs-github-trawler'})
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def request(self, method, path, params=None, json_body=None, allow=(200,)):
+        """
+        Make one API call and return (status, decoded JSON or None).
+        Goes through the rate limit scheduler when one is installed.
+        """
+        scheduler = rate_limit.scheduler
+        resource = rate_limit.resource_for(path)
+        attempt = 0
+        async with self.semaphore:
+            while True:
+                token = self.gh_token
+                if scheduler is not None:
+                    # acquire() may sleep, keep it off the event loop
+                    token = await asyncio.get_running_loop().run_in_executor(None, scheduler.acquire, resource)
+                async with self.session.request(method, self.api_url + path, params=params, json=json_body,
+                                                headers={'Authorization': 'token %s' % token}) as response:
+                    request_stats['requests'] += 1
+                    text = await response.text()
+                    status = response.status
+                    headers = dict(response.headers)
+                metrics.record_request(method, path, status, len(text))
+                if scheduler is not None:
+                    scheduler.update(token, resource, headers)
+                    delay = None
+                    if attempt < rate_limit.MAX_RETRIES:
+                        delay = scheduler.backoff(token, resource, status, headers, text, attempt)
+                    if delay is not None:
+                        print("- Rate limited on %s, retrying in %.0fs" % (resource, delay))
+                        await asyncio.sleep(delay)
+                        attempt += 1
+                        continue
+                break
+        if status not in allow:
+            raise AsyncGithubError("%s %s failed with HTTP %s: %s" % (method, path, status, text))
+        if status == 204 or not text:
+            return status, None
+        return status, json.loads(text)
+
+    async def search_issues(self, search_string, first=None):
+        """
+        All items of a search, the first page (fetched here unless given)
+        tells how many further pages to fetch concurrently
+        """
+        params = {'q': search_string, 'per_page': SEARCH_PAGE_SIZE, 'page': 1}
+        if first is None:
+            status, first = await self.request('GET', '/search/issues', params)
+        total_count = first['total_count']
+        pages = min(-(-total_count // SEARCH_PAGE_SIZE), SEARCH_MAX_PAGES)
+        rest = await asyncio.gather(*[
+            self.request('GET', '/search/issues', dict(params, page=page)) for page in range(2, pages + 1)])
+        items = list(first['items'])
+        for status, page in rest:
+            items.extend(page['items'])
+        return items
+
+    async def get_pull(self, repo_name, number):
+        status, pull = await self.request('GET', '/repos/%s/pulls/%s' % (repo_name, number))
+        return pull
+
+    async def set_labels(self, repo_name, number, labels):
+        await self.request('PUT', '/repos/%s/issues/%s/labels' % (repo_name, number),
+                           json_body={'labels': list(labels)})
+
+
+async def fill_record(client, repo_name, record, required):
+    if pulls.missing_fields(record, required):
+        pull = await client.get_pull(repo_name, record['number'])
+        pulls.request_stats['pulls_fetched'] += 1
+        record['draft'] = pull.get('draft')
+        record['merged_at'] = pulls.parse_gh_date(pull.get('merged_at'))
+        record['merge_commit_sha'] = pull.get('merge_commit_sha')
+    else:
+        pulls.request_stats['pulls_saved'] += 1
+    return record
+
+
+async def search_pr_records(gh_token, repo_name, search_string, required=(), api_url=API_URL,
+                            concurrency=DEFAULT_CONCURRENCY, first_page=None):
+    """
+    PR records for a search, with search pages and any pull detail
+    fetches all running concurrently on one event loop. A `first_page`
+    already fetched (to count the results) isn't asked for again.
+    """
+    async with AsyncGithub(gh_token, api_url, concurrency) as client:
+        return await client_search_records(client, repo_name, search_string, required, first_page)
+
+
+async def client_search_records(client, repo_name, search_string, required, first_page=None):
+    items = await client.search_issues(search_string, first_page)
+    records = [pulls.record_from_raw(item) for item in items]
+    return await asyncio.gather(*[fill_record(client, repo_name, record, required) for record in records])
+
+
+async def search_shards_pr_records(gh_token, repo_name, search_strings, required=(), api_url=API_URL,
+                                   concurrency=DEFAULT_CONCURRENCY, first_pages=None):
+    """
+    PR records for several searches at once (the shards of one big search),
+    returned as one list of records per search string. `first_pages` maps
+    search strings to first pages already fetched.
+    """
+    first_pages = first_pages or {}
+    async with AsyncGithub(gh_token, api_url, concurrency) as client:
+        return await asyncio.gather(*[client_search_records(client, repo_name, search_string, required,
+                                                            first_pages.get(search_string))
+                                      for search_string in search_strings])
+
+
+async def pr_records_by_number(gh_token, repo_name, numbers, api_url=API_URL, concurrency=DEFAULT_CONCURRENCY):
+    """
+    PR records for the given PR numbers, all pulls fetched concurrently.
+    Numbers that aren't PRs of the repo are left out.
+    """
+    async with AsyncGithub(gh_token, api_url, concurrency) as client:
+        responses = await asyncio.gather(*[
+            client.request('GET', '/repos/%s/pulls/%s' % (repo_name, number), allow=(200, 404))
+            for number in numbers])
+    pulls.request_stats['pulls_fetched'] += len(responses)
+    return [pulls.record_from_pull(pull) for status, pull in responses if status == 200]
+
+
+async def set_labels(gh_token, repo_name, plan, api_url=API_URL, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Replace the labels of each (number, labels) in `plan` concurrently, returns how many were set
+    """
+    async with AsyncGithub(gh_token, api_url, concurrency) as client:
+        await asyncio.gather(*[client.set_labels(repo_name, number, labels) for number, labels in plan])
+    return len(plan)
+
+
+def print_request_stats():
+    print("- Async backend made %s requests" % request_stats['requests'])
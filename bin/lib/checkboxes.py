@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Find the ticked type checkboxes ("- [x] Bug fix ...") in PR descriptions.
+"""
+
+import re
+
+# the type checkboxes of the PR template and the label each one stands for
+TYPE_CHECKBOXES = {"type:bug": "Bug fix", "type:enhancement": "Enhancement",
+                   "type:experimental-feature": "Experimental feature", "type:new_feature": "New feature",
+                   "type:cleanup": "Cleanup", "type:breaking_change": "Breaking change"}
+
+
+class CheckboxParser:
+    """
+    One precompiled pattern for all checkbox texts of a {label: text} table.
+    ticked() finds every ticked checkbox in a single pass over the body and
+    maps its text back to the label, matching what a separate
+    re.search('.*- \\[ ?x ?\\] ' + text + ' .*', body, re.I) per label found.
+    """
+
+    def __init__(self, label_texts):
+        self.labels = dict((text.lower(), label) for label, text in label_texts.items())
+        # longest first, so a text that starts with another one still wins
+        texts = sorted(label_texts.values(), key=len, reverse=True)
+        self.pattern = re.compile(r'- \[ ?x ?\] (%s) ' % '|'.join(re.escape(t) for t in texts), re.I)
+
+    def ticked(self, body):
+        """
+        The set of labels whose checkbox is ticked in `body`
+        """
+        return set(self.labels[m.group(1).lower()] for m in self.pattern.finditer(str(body)))
+
+
+type_parser = CheckboxParser(TYPE_CHECKBOXES)
+
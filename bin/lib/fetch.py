@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+from github import UnknownObjectException
+from lib import async_client
+from lib import gh_client
+from lib import graphql
+from lib import pulls
+from lib import rate_limit
+from lib import search_planner
+from lib import workers
+
+BACKENDS = ('rest', 'graphql', 'async')
+SEARCH_PAGE_SIZE = 100
+
+
+def repo_query(repo, base=None):
+    """
+    The search qualifiers for the PRs of a repo, only those targeting branch `base` when one is given
+    """
+    return f"repo:{repo.full_name} base:{base}" if base else f"repo:{repo.full_name}"
+
+
+def search_prs(gh, repo, search_string, required=(), backend='rest', gh_token=None, num_workers=1):
+    """
+    Yield a frozen pulls.PRRecord for each PR matching a search string, from the chosen backend.
+    'rest' pages through /search/issues, 'graphql' fetches 100 PRs per query
+    and 'async' fetches all search pages and pulls concurrently on one event loop.
+    Any rest get_pull fallbacks run on `num_workers` threads.
+    Searches over the 1000 result cap are split into date range shards
+    (see search_planner), fetched on `num_workers` threads and de-duplicated.
+    """
+    counted = {}
+    total_count = count_search(gh, search_string, counted, backend, gh_token)
+    if total_count <= search_planner.SEARCH_CAP:
+        shards = [search_string]
+    else:
+        shards = [query for query, count in search_planner.plan_shards(
+            search_string, lambda query: count_search(gh, query, counted, backend, gh_token))]
+        print("- Search '%s' has %s results, splitting it into %s date range shards"
+              % (search_string, total_count, len(shards)))
+
+    if len(shards) == 1:
+        results = [search_shard(gh, repo, shards[0], required, backend, gh_token, num_workers, counted)]
+    elif backend == 'async':
+        results = asyncio.run(async_client.search_shards_pr_records(
+            first_token(gh_token), repo.full_name, shards, required, gh_client.api_url,
+            first_pages=counted))
+    else:
+        results = workers.ordered_map(
+            lambda shard: list(search_shard(gh, repo, shard, required, backend, gh_token, 1, counted)),
+            shards, num_workers)
+
+    seen = set()
+    for records in results:
+        for record in records:
+            # a PR updated while the shards are fetched can show up twice
+            if record['number'] in seen:
+                continue
+            seen.add(record['number'])
+            yield pulls.freeze(record)
+    print("- Search '%s': total_count %s, fetched %s PRs" % (search_string, total_count, len(seen)))
+
+
+def search_page(gh, search_string, page):
+    """
+    One page of raw /search/issues JSON
+    """
+    headers, data = gh.requester.requestJsonAndCheck(
+        "GET", "/search/issues", parameters={'q': search_string, 'per_page': SEARCH_PAGE_SIZE, 'page': page})
+    return data
+
+
+def count_search(gh, search_string, counted, backend='rest', gh_token=None):
+    """
+    The total count of a search, from its first page as the backend fetches
+    it (a GraphQL page carries issueCount, a REST page total_count). The
+    page is kept in `counted` for search_shard() to reuse, so counting costs no extra request.
+    """
+    if backend == 'graphql':
+        first_page = graphql.search_page(gh_token, search_string, url=gh_client.graphql_url())
+        counted[search_string] = first_page
+        return first_page['issueCount']
+    first_page = search_page(gh, search_string, 1)
+    counted[search_string] = first_page
+    return first_page['total_count']
+
+
+def search_items(gh, search_string, first_page=None):
+    """
+    Yield the raw items of every page of a search, up to the 1000 results the API serves
+    """
+    page_number = 1
+    page = first_page or search_page(gh, search_string, page_number)
+    while True:
+        yield from page['items']
+        if len(page['items']) < SEARCH_PAGE_SIZE or page_number * SEARCH_PAGE_SIZE >= \
+                min(page['total_count'], search_planner.SEARCH_CAP):
+            return
+        page_number += 1
+        page = search_page(gh, search_string, page_number)
+
+
+def search_shard(gh, repo, search_string, required, backend, gh_token, num_workers, counted):
+    if backend == 'graphql':
+        yield from graphql.search_pr_records(gh_token, search_string, gh_client.graphql_url(),
+                                             counted.pop(search_string, None))
+    elif backend == 'async':
+        yield from asyncio.run(async_client.search_pr_records(
+            first_token(gh_token), repo.full_name, search_string, required, gh_client.api_url,
+            first_page=counted.pop(search_string, None)))
+    else:
+        items = search_items(gh, search_string, counted.pop(search_string, None))
+        yield from workers.ordered_map(lambda raw: pulls.build_pr_record(raw, repo, required), items, num_workers)
+
+
+def get_pr_records(repo, numbers, backend='rest', gh_token=None, num_workers=1):
+    """
+    Yield a frozen pulls.PRRecord for each of the given PR numbers, without
+    searching: 'graphql' asks for 100 PRs per query, 'async' fetches every
+    pull concurrently and 'rest' makes one pull request each on
+    `num_workers` threads. Numbers that aren't PRs of the repo are skipped.
+    """
+    numbers = list(numbers)
+    if backend == 'graphql':
+        records = graphql.pr_records_by_number(gh_token, repo.full_name, numbers, gh_client.graphql_url())
+    elif backend == 'async':
+        records = asyncio.run(async_client.pr_records_by_number(
+            first_token(gh_token), repo.full_name, numbers, gh_client.api_url))
+    else:
+        records = (record for record in workers.ordered_map(lambda number: get_pull_record(repo, number),
+                                                            numbers, num_workers) if record)
+    count = 0
+    for record in records:
+        count += 1
+        yield pulls.freeze(record)
+    print("- Fetched %s of %s PRs by number" % (count, len(numbers)))
+
+
+def get_pull_record(repo, number):
+    """
+    The PR record of one pull, or None when `number` isn't a PR of the repo
+    """
+    with pulls.stats_lock:
+        pulls.request_stats['pulls_fetched'] += 1
+    try:
+        headers, pull = repo.requester.requestJsonAndCheck("GET", "%s/pulls/%s" % (repo.url, number))
+    except UnknownObjectException:
+        return None
+    return pulls.record_from_pull(pull)
+
+
+def first_token(gh_token):
+    return rate_limit.split_tokens(gh_token)[0]
+
+
+def apply_label_plan(repo, plan, backend='rest', gh_token=None, num_workers=1):
+    """
+    Write a label plan (see label_plan.build_plan) with one set-labels call
+    per changed PR. The async backend sends them all concurrently, otherwise
+    they go through PyGithub's requester on `num_workers` threads. Returns the number of writes.
+    """
+    if not plan:
+        return 0
+    print("- Setting labels on %s PRs" % len(plan))
+    if backend == 'async':
+        return asyncio.run(async_client.set_labels(
+            first_token(gh_token), repo.full_name,
+            [(entry['pr'].number, entry['desired']) for entry in plan], gh_client.api_url))
+
+    def apply(entry):
+        # the same PUT Issue.set_labels() makes, without fetching the issue first
+        repo.requester.requestJsonAndCheck("PUT", "%s/issues/%s/labels" % (repo.url, entry['pr'].number),
+                                           input=entry['desired'])
+    return len(list(workers.ordered_map(apply, plan, num_workers)))
+
+
+def print_stats(backend):
+    if backend == 'graphql':
+        graphql.print_query_stats()
+    else:
+        pulls.print_request_stats()
+    if backend == 'async':
+        async_client.print_request_stats()
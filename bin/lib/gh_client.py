@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import time
+from github import Github
+from github.Requester import Requester, HTTPRequestsConnectionClass, HTTPSRequestsConnectionClass
+from lib import http_cache
+from lib import metrics
+from lib import rate_limit
+
+
+API_URL = "https://api.github.com"
+
+api_url = API_URL
+
+
+class CachedResponse:
+    """
+    Stands in for PyGithub's RequestsResponse when a 304 is answered from the cache
+    """
+
+    def __init__(self, status, headers, text):
+        self.status = status
+        self.headers = headers
+        self.text = text
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def read(self):
+        return self.text
+
+
+class TrawlerConnectionMixin:
+    """
+    Hooks every request PyGithub makes. Set `cache` to an HttpCache to
+    make GETs conditional and answer 304s locally, and `scheduler` to a
+    RateLimitScheduler to pace requests and rotate tokens.
+    """
+
+    cache = None
+    scheduler = None
+    # PyGithub builds a new connection per request once connection classes
+    # are injected, share one session per host so keep-alive still works
+    sessions = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        key = (self.protocol, self.host, self.port)
+        if key in self.sessions:
+            self.session = self.sessions[key]
+        else:
+            self.sessions[key] = self.session
+
+    def close(self):
+        pass
+
+    def request(self, verb, url, input, headers, stream=False):
+        headers = dict(headers)
+        self.verb = verb
+        self.stream = stream
+        self.cache_key = None
+        self.cacheable = self.cache is not None and verb == "GET" and not stream and http_cache.cacheable(url)
+        super().request(verb, url, input, headers, stream)
+
+    def ask_cache(self):
+        """
+        Key the request by the headers it goes out with (the token may have
+        just been rotated) and make it conditional on the cached copy
+        """
+        if not self.cacheable:
+            return
+        for name in ('If-None-Match', 'If-Modified-Since'):
+            self.headers.pop(name, None)
+        self.cache_key = http_cache.cache_key(self.host, self.port, self.url, self.headers)
+        self.headers.update(self.cache.validators(self.cache_key))
+
+    def send(self):
+        """
+        Make the request, waiting on the rate limit scheduler before it and
+        retrying when Github answers with a primary or secondary rate limit
+        """
+        if self.scheduler is None:
+            self.ask_cache()
+            return super().getresponse()
+        resource = rate_limit.resource_for(self.url)
+        attempt = 0
+        while True:
+            token = self.scheduler.acquire(resource)
+            if len(self.scheduler.tokens) > 1:
+                self.headers['Authorization'] = 'token %s' % token
+            self.ask_cache()
+            response = super().getresponse()
+            headers = dict(response.getheaders())
+            self.scheduler.update(token, resource, headers)
+            if response.status not in (403, 429) or attempt >= rate_limit.MAX_RETRIES:
+                return response
+            delay = self.scheduler.backoff(token, resource, response.status, headers, response.read(), attempt)
+            if delay is None:
+                return response
+            print("- Rate limited on %s, retrying in %.0fs" % (resource, delay))
+            time.sleep(delay)
+            attempt += 1
+
+    def getresponse(self):
+        response = self.send()
+        if self.cache_key is not None and response.status == 304:
+            cached = self.cache.hit(self.cache_key)
+            if cached is not None:
+                metrics.record_request(self.verb, self.url, 304, 0, cached=True)
+                headers, body = cached
+                # keep the fresh rate limit headers from the 304
+                headers = dict(headers)
+                headers.update(dict(response.getheaders()))
+                return CachedResponse(200, headers, body)
+        if self.stream:
+            metrics.record_request(self.verb, self.url, response.status, 0)
+            return response
+        body = response.read()
+        # a cacheable GET that wasn't answered from the cache, as HttpCache.misses counts it
+        missed = self.cache_key is not None and response.status == 200
+        metrics.record_request(self.verb, self.url, response.status, len(body or ''), cache_miss=missed)
+        if missed:
+            self.cache.store(self.cache_key, dict(response.getheaders()), body)
+        return response
+
+
+class TrawlerHTTPConnection(TrawlerConnectionMixin, HTTPRequestsConnectionClass):
+    pass
+
+
+class TrawlerHTTPSConnection(TrawlerConnectionMixin, HTTPSRequestsConnectionClass):
+    pass
+
+
+def graphql_url():
+    """
+    The GraphQL endpoint belonging to api_url
+    """
+    if api_url.rstrip('/').endswith('/api/v3'):
+        # Github Enterprise serves GraphQL next to the REST API
+        return api_url.rstrip('/')[:-len('/v3')] + '/graphql'
+    return api_url.rstrip('/') + '/graphql'
+
+
+def get_github(gh_tokens, tmp_dir=None, use_cache=True, gh_api_url=API_URL, rate_limit_server=None,
+               rate_limit_key=None):
+    """
+    Return a Github client whose requests go through the trawler connection
+    classes, with a persistent HTTP cache under `tmp_dir` when `use_cache` is set.
+    Requests are paced by a rate limit scheduler rotating over `gh_tokens`, or
+    by the one another process serves at `rate_limit_server` (see rate_limit.serve_shared).
+    """
+    global api_url
+    api_url = gh_api_url
+    gh_tokens = rate_limit.split_tokens(gh_tokens)
+    if use_cache and tmp_dir:
+        TrawlerConnectionMixin.cache = http_cache.HttpCache(os.path.join(tmp_dir, http_cache.CACHE_FILE_NAME))
+    if rate_limit_server:
+        rate_limit.scheduler = rate_limit.connect_shared(rate_limit_server, rate_limit_key)
+    else:
+        rate_limit.scheduler = rate_limit.RateLimitScheduler(gh_tokens)
+    TrawlerConnectionMixin.scheduler = rate_limit.scheduler
+    Requester.injectConnectionClasses(TrawlerHTTPConnection, TrawlerHTTPSConnection)
+    # the scheduler paces reads, PyGithub's own fixed gap between requests
+    # would serialise the worker threads
+    return Github(gh_tokens[0], base_url=api_url, per_page=100, seconds_between_requests=None)
+
+
+def finish():
+    """
+    Persist the HTTP cache and print its counters, call at the end of a run
+    """
+    cache = TrawlerConnectionMixin.cache
+    if cache is not None:
+        cache.save()
+        cache.print_stats()
+    if TrawlerConnectionMixin.scheduler is not None:
+        TrawlerConnectionMixin.scheduler.print_stats()
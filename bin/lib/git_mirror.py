@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import fcntl
+import os
+import shutil
+from contextlib import contextmanager
+import pygit2
+
+
+# written into every mirror this module clones, only such directories are ever removed
+MARKER_FILE_NAME = "trawler-mirror"
+
+
+class MirrorError(Exception):
+    pass
+
+
+@contextmanager
+def mirror_lock(mirror_dir):
+    """
+    Hold an exclusive lock on a mirror so concurrent runs don't clone or fetch over each other
+    """
+    lock_path = mirror_dir.rstrip('/') + ".lock"
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def open_mirror(mirror_dir):
+    """
+    Return the bare repository in mirror_dir, or None if there isn't a usable one
+    """
+    if not os.path.isdir(mirror_dir):
+        return None
+    try:
+        mirror = pygit2.Repository(mirror_dir)
+    except (pygit2.GitError, KeyError):
+        return None
+    # pygit2 searches parent directories, a directory inside a checkout isn't a mirror
+    if not mirror.is_bare or os.path.realpath(mirror.path) != os.path.realpath(mirror_dir):
+        return None
+    return mirror
+
+
+def sync_mirror(clone_url, branch, mirror_dir):
+    """
+    Make mirror_dir a bare mirror of clone_url with `branch` up to date.
+    The first call clones, later calls only fetch the new objects on `branch`.
+    """
+    with mirror_lock(mirror_dir):
+        mirror = open_mirror(mirror_dir)
+        marker = os.path.join(mirror_dir, MARKER_FILE_NAME)
+        if mirror is None:
+            # an empty directory is fine to clone into, only a mirror this code
+            # cloned is removed when it no longer opens, anything else is left alone
+            if os.path.isdir(mirror_dir) and os.listdir(mirror_dir):
+                if not os.path.isfile(marker):
+                    raise MirrorError("%s is not a git mirror made by the trawler, check --mirror_dir/--tmp_dir"
+                                      % mirror_dir)
+                print("- Removing broken git mirror %s" % mirror_dir)
+                shutil.rmtree(mirror_dir)
+            print("- Cloning repo to avoid too many Github API calls, sorry, this could take a while")
+            mirror = pygit2.clone_repository(clone_url, mirror_dir, bare=True, checkout_branch=branch)
+            open(marker, "w").close()
+        else:
+            if not os.path.isfile(marker):
+                # a mirror cloned before the marker existed
+                open(marker, "w").close()
+            print("- Fetching new commits on '%s' and tags into mirror %s" % (branch, mirror_dir))
+            refspec = "+refs/heads/%s:refs/heads/%s" % (branch, branch)
+            # release tags feed the tag index (see tag_index.py)
+            mirror.remotes["origin"].fetch([refspec, "+refs/tags/*:refs/tags/*"])
+    return mirror
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import time
+import requests
+from lib import metrics
+from lib import pulls
+from lib import rate_limit
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+PAGE_SIZE = 100
+
+# what every PR query asks for, see node_to_record
+PR_FIELDS = """
+    number
+    title
+    body
+    isDraft
+    state
+    createdAt
+    updatedAt
+    mergedAt
+    mergeCommit { oid }
+    labels(first: 100) { nodes { name } }
+"""
+
+SEARCH_PRS_QUERY = """
+query($search: String!, $cursor: String, $page_size: Int!) {
+  search(query: $search, type: ISSUE, first: $page_size, after: $cursor) {
+    issueCount
+    pageInfo { hasNextPage endCursor }
+    nodes {
+      ... on PullRequest {%s}
+    }
+  }
+}
+""" % PR_FIELDS
+
+query_stats = {'queries': 0}
+
+
+class GraphQLError(Exception):
+    pass
+
+
+def run_query(gh_token, query, variables, url=GRAPHQL_URL, session=None, partial=False):
+    """
+    POST a single GraphQL query and return its 'data' member. With
+    `partial` errors are tolerated as long as some data came back (a
+    missing PR in a batch leaves its alias null).
+    """
+    http = session or requests
+    scheduler = rate_limit.scheduler
+    attempt = 0
+    while True:
+        if scheduler is not None:
+            gh_token = scheduler.acquire('graphql')
+        response = http.post(url, json={'query': query, 'variables': variables},
+                             headers={'Authorization': 'bearer %s' % gh_token})
+        query_stats['queries'] += 1
+        metrics.record_request('POST', url, response.status_code, len(response.content))
+        if scheduler is None:
+            break
+        scheduler.update(gh_token, 'graphql', response.headers)
+        delay = None
+        if attempt < rate_limit.MAX_RETRIES:
+            delay = scheduler.backoff(gh_token, 'graphql', response.status_code, response.headers,
+                                      response.text, attempt)
+        if delay is None:
+            break
+        print("- Rate limited on graphql, retrying in %.0fs" % delay)
+        time.sleep(delay)
+        attempt += 1
+    if response.status_code != 200:
+        raise GraphQLError("GraphQL request failed with HTTP %s: %s"
+                           % (response.status_code, response.text))
+    result = response.json()
+    if result.get('errors') and not (partial and result.get('data')):
+        raise GraphQLError("GraphQL query returned errors: %s" % result['errors'])
+    return result['data']
+
+
+def node_to_record(node):
+    """
+    Convert a PullRequest search node into the same record dict as pulls.build_pr_record
+    """
+    # REST reports merged PRs as 'closed', keep the records interchangeable
+    state = node['state'].lower()
+    if state == 'merged':
+        state = 'closed'
+    merge_commit = node.get('mergeCommit') or {}
+    return {
+        'number': node['number'],
+        'title': node.get('title') or '',
+        'labels': [l['name'] for l in node['labels']['nodes']],
+        'body': node.get('body'),
+        'draft': node.get('isDraft'),
+        'state': state,
+        'created_at': pulls.parse_gh_date(node.get('createdAt')),
+        'updated_at': pulls.parse_gh_date(node.get('updatedAt')),
+        'merged_at': pulls.parse_gh_date(node.get('mergedAt')),
+        'merge_commit_sha': merge_commit.get('oid'),
+    }
+
+
+def search_page(gh_token, search_string, cursor=None, url=GRAPHQL_URL, session=None):
+    """
+    One page of a search: its issueCount, pageInfo and PAGE_SIZE PR nodes
+    """
+    return run_query(gh_token, SEARCH_PRS_QUERY, {'search': search_string, 'cursor': cursor, 'page_size': PAGE_SIZE},
+                     url, session)['search']
+
+
+def search_pr_records(gh_token, search_string, url=GRAPHQL_URL, first_page=None):
+    """
+    Yield PR records for a search string, PAGE_SIZE PRs per query.
+    A `first_page` already fetched (to count the results) isn't asked for again.
+    """
+    session = requests.Session()
+    search = first_page or search_page(gh_token, search_string, None, url, session)
+    while True:
+        for node in search['nodes']:
+            # search type ISSUE can return plain issues, which come back empty
+            if node:
+                yield node_to_record(node)
+        if not search['pageInfo']['hasNextPage']:
+            break
+        search = search_page(gh_token, search_string, search['pageInfo']['endCursor'], url, session)
+
+
+def pr_records_by_number(gh_token, repo_name, numbers, url=GRAPHQL_URL):
+    """
+    Yield PR records for the given PR numbers, PAGE_SIZE PRs per query.
+    Numbers that aren't PRs of the repo are skipped.
+    """
+    owner, name = repo_name.split('/')
+    session = requests.Session()
+    numbers = list(numbers)
+    for start in range(0, len(numbers), PAGE_SIZE):
+        fields = ''.join('pr%s: pullRequest(number: %s) {%s}\n' % (number, number, PR_FIELDS)
+                         for number in numbers[start:start + PAGE_SIZE])
+        query = 'query($owner: String!, $name: String!) { repository(owner: $owner, name: $name) {\n%s} }' % fields
+        data = run_query(gh_token, query, {'owner': owner, 'name': name}, url, session, partial=True)
+        for node in (data.get('repository') or {}).values():
+            if node:
+                yield node_to_record(node)
+
+
+def print_query_stats():
+    print("- GraphQL backend used %s queries" % query_stats['queries'])
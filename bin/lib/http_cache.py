@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import unquote_plus
+
+CACHE_FILE_NAME = "acs_trawler_http_cache.json"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def cache_key(host, port, url, headers):
+    """
+    What a response is cached under: the URL, the media type asked for and
+    (hashed, never stored as is) the token it was asked with, as Github
+    answers differently for each
+    """
+    headers = dict((name.lower(), value) for name, value in headers.items())
+    token = hashlib.sha256(headers.get('authorization', '').encode('utf-8')).hexdigest()[:16]
+    return "%s:%s%s|%s|%s" % (host, port, url, headers.get('accept', ''), token)
+
+
+def cacheable(url):
+    """
+    Searches on an updated:>= timestamp are asked once and never again,
+    caching them would only push useful entries out
+    """
+    url = unquote_plus(url)
+    return not ('/search/' in url and 'updated:' in url)
+
+
+def body_size(body):
+    return len(body.encode('utf-8')) if isinstance(body, str) else len(body)
+
+
+class HttpCache:
+    """
+    Persistent store of GET responses keyed by cache_key(), replayed with
+    If-None-Match / If-Modified-Since so unchanged resources come back as 304s.
+    Entries are kept in least recently used order and evicted once the
+    bodies go over `max_bytes`.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        if os.path.isfile(path):
+            try:
+                with open(path) as cache_file:
+                    for key, entry in json.load(cache_file):
+                        self.entries[key] = entry
+                        self.size += body_size(entry['body'])
+            except Exception as e:
+                print("- Ignoring unreadable HTTP cache '%s': %s" % (path, str(e)))
+                self.entries = OrderedDict()
+                self.size = 0
+
+    def validators(self, key):
+        """
+        Return the conditional request headers for a cached URL
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                return {}
+            headers = {}
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+            return headers
+
+    def hit(self, key):
+        """
+        A 304 came back for `key`, return the stored (headers, body) and mark it recently used
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry['headers'], entry['body']
+
+    def store(self, key, headers, body):
+        """
+        Keep a 200 response if it carries a validator, evicting the least recently used entries
+        """
+        etag = headers.get('ETag') or headers.get('etag')
+        last_modified = headers.get('Last-Modified') or headers.get('last-modified')
+        with self.lock:
+            self.misses += 1
+            if not etag and not last_modified:
+                return
+            size = body_size(body)
+            if size > self.max_bytes:
+                return
+            old = self.entries.pop(key, None)
+            if old:
+                self.size -= body_size(old['body'])
+            self.entries[key] = {'etag': etag, 'last_modified': last_modified,
+                                 'headers': dict(headers), 'body': body}
+            self.size += size
+            while self.size > self.max_bytes:
+                evicted_key, evicted = self.entries.popitem(last=False)
+                self.size -= body_size(evicted['body'])
+                self.evictions += 1
+
+    def save(self):
+        with self.lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as cache_file:
+                json.dump(list(self.entries.items()), cache_file)
+            os.replace(tmp_path, self.path)
+
+    def print_stats(self):
+        print("- HTTP cache: %s hits (304), %s misses, %s evictions, %s entries / %s bytes in %s"
+              % (self.hits, self.misses, self.evictions, len(self.entries), self.size, self.path))
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+def build_plan(changes):
+    """
+    Fold the (PRRecord, 'add'|'remove', label) changes queued by a run into
+    one entry per PR: {'pr', 'current', 'desired'} with label name lists.
+    PRs whose desired labels already match their current labels are left
+    out, so the plan holds exactly the PRs that need a write.
+    """
+    plan = {}
+    for pr, action, label in changes:
+        entry = plan.setdefault(pr.number, {'pr': pr, 'current': sorted(pr.labels),
+                                            'desired': sorted(pr.labels)})
+        if action == 'add' and label not in entry['desired']:
+            entry['desired'].append(label)
+        elif action == 'remove' and label in entry['desired']:
+            entry['desired'].remove(label)
+    return [entry for number, entry in sorted(plan.items())
+            if set(entry['desired']) != set(entry['current'])]
+
+
+def diff_line(entry):
+    """
+    '#number: +added -removed' for one PR in the plan
+    """
+    added = ['+' + l for l in entry['desired'] if l not in entry['current']]
+    removed = ['-' + l for l in entry['current'] if l not in entry['desired']]
+    return "#%s: %s" % (entry['pr'].number, ' '.join(added + removed))
+
+
+def print_plan(plan, dry_run):
+    print("\nLabel plan: %s PRs to change%s" % (len(plan), " (dry run, nothing written)" if dry_run else ""))
+    for entry in plan:
+        print("- " + diff_line(entry))
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from lib import rate_limit
+
+# path patterns, first match names the endpoint a request is counted under
+ENDPOINTS = [
+    ('search_issues', re.compile(r'/search/issues$')),
+    ('graphql', re.compile(r'/graphql$')),
+    ('issue_labels', re.compile(r'/repos/[^/]+/[^/]+/issues/\d+/labels(/.*)?$')),
+    ('issues', re.compile(r'/repos/[^/]+/[^/]+/issues/\d+$')),
+    ('pulls', re.compile(r'/repos/[^/]+/[^/]+/pulls/\d+$')),
+    ('commits', re.compile(r'/repos/[^/]+/[^/]+/commits/[^/]+$')),
+    ('repo', re.compile(r'/repos/[^/]+/[^/]+$')),
+]
+
+
+def endpoint_for(url):
+    path = url.split('?')[0].rstrip('/')
+    for name, pattern in ENDPOINTS:
+        if pattern.search(path):
+            return name
+    return 'other'
+
+
+class RunMetrics:
+    """
+    Durations of the named phases of a run and every API request made
+    during it: counts by endpoint and status, bytes received and which
+    phase was running. Request counters are updated from worker threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.phases = []
+        self.current_phase = None
+        self.requests = {}
+        self.statuses = {}
+        self.bytes_received = 0
+        self.cached = 0
+        self.cache_misses = 0
+        self.report = {}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time the enclosed block as phase `name`
+        """
+        outer = self.current_phase
+        entry = {'phase': name, 'seconds': 0.0, 'requests': 0, 'bytes_received': 0}
+        self.current_phase = entry
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['seconds'] = round(time.perf_counter() - start, 3)
+            self.current_phase = outer
+            with self.lock:
+                self.phases.append(entry)
+
+    def record_request(self, method, url, status, size, cached=False, cache_miss=False):
+        """
+        Count one API response of `size` bytes, `cached` when it was a 304 answered from the HTTP cache,
+        `cache_miss` when it was a cacheable GET the cache couldn't answer
+        """
+        endpoint = "%s %s" % (method, endpoint_for(url))
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+            self.bytes_received += size
+            if cached:
+                self.cached += 1
+            if cache_miss:
+                self.cache_misses += 1
+            if self.current_phase is not None:
+                self.current_phase['requests'] += 1
+                self.current_phase['bytes_received'] += size
+
+    def summary(self, script):
+        """
+        Everything recorded so far as a JSON-able dict
+        """
+        with self.lock:
+            summary = {
+                'script': script,
+                'started': int(self.started),
+                'duration_seconds': round(time.time() - self.started, 3),
+                'phases': list(self.phases),
+                'requests_by_endpoint': dict(self.requests),
+                'requests_by_status': dict(self.statuses),
+                'requests_total': sum(self.requests.values()),
+                'bytes_received': self.bytes_received,
+                'http_cache': {'hits': self.cached, 'misses': self.cache_misses},
+                'rate_limit': {},
+                'report': dict(self.report),
+            }
+        scheduler = rate_limit.scheduler
+        if scheduler is not None:
+            summary['rate_limit'] = scheduler.consumption()
+        return summary
+
+
+def prometheus_lines(summary):
+    """
+    The summary in the Prometheus text exposition format, for node_exporter's textfile collector
+    """
+    script = summary['script']
+    lines = []
+
+    def metric(name, help_text, samples):
+        lines.append("# HELP trawler_%s %s" % (name, help_text))
+        lines.append("# TYPE trawler_%s gauge" % name)
+        for labels, value in samples:
+            label_text = ','.join('%s="%s"' % item for item in [('script', script)] + labels)
+            lines.append("trawler_%s{%s} %s" % (name, label_text, value))
+
+    phase_seconds = {}
+    phase_requests = {}
+    for entry in summary['phases']:
+        phase_seconds[entry['phase']] = phase_seconds.get(entry['phase'], 0) + entry['seconds']
+        phase_requests[entry['phase']] = phase_requests.get(entry['phase'], 0) + entry['requests']
+    metric('run_timestamp_seconds', "When the run started.", [([], summary['started'])])
+    metric('run_duration_seconds', "Wall time of the whole run.", [([], summary['duration_seconds'])])
+    metric('phase_duration_seconds', "Wall time of each phase of the run.",
+           [([('phase', name)], round(value, 3)) for name, value in phase_seconds.items()])
+    metric('phase_api_requests', "API requests made during each phase.",
+           [([('phase', name)], value) for name, value in phase_requests.items()])
+    metric('api_requests', "API requests by method and endpoint.",
+           [(list(zip(('method', 'endpoint'), key.split(' ', 1))), value)
+            for key, value in sorted(summary['requests_by_endpoint'].items())])
+    metric('api_responses', "API responses by HTTP status.",
+           [([('status', status)], value) for status, value in sorted(summary['requests_by_status'].items())])
+    metric('api_bytes_received', "Bytes of API response bodies received.", [([], summary['bytes_received'])])
+    metric('http_cache_hits', "Requests answered with a 304 from the HTTP cache.",
+           [([], summary['http_cache']['hits'])])
+    metric('http_cache_misses', "Cacheable GET requests that were not answered from the HTTP cache.", [([], summary['http_cache']['misses'])])
+    metric('rate_limit_used', "Rate limit budget used by the run.",
+           [([('resource', resource)], budget['used']) for resource, budget in sorted(summary['rate_limit'].items())])
+    metric('rate_limit_remaining', "Rate limit budget left across all tokens at the end of the run.",
+           [([('resource', resource)], budget['remaining'])
+            for resource, budget in sorted(summary['rate_limit'].items())])
+    if summary.get('report', {}).get('table_rows'):
+        metric('report_rows', "Rows in each table of the report.",
+               [([('table', table)], value) for table, value in sorted(summary['report']['table_rows'].items())])
+    return lines
+
+
+def write(script, output_file):
+    """
+    Write the run's metrics next to `output_file`: <name>.metrics.json and
+    <name>.prom. Both are replaced atomically so a collector never reads half a file.
+    """
+    summary = recorder.summary(script)
+    base = os.path.splitext(output_file)[0]
+    for path, text in ((base + ".metrics.json", json.dumps(summary, indent=4) + "\n"),
+                       (base + ".prom", "\n".join(prometheus_lines(summary)) + "\n")):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as metrics_file:
+            metrics_file.write(text)
+        os.replace(tmp_path, path)
+    print("- Run metrics written to %s.metrics.json and %s.prom" % (base, base))
+    return summary
+
+
+recorder = RunMetrics()
+
+
+def reset():
+    """
+    Start recording afresh, for long running processes that write metrics once per cycle
+    """
+    global recorder
+    recorder = RunMetrics()
+
+
+def phase(name):
+    return recorder.phase(name)
+
+
+def record_request(method, url, status, size, cached=False, cache_miss=False):
+    recorder.record_request(method, url, status, size, cached, cache_miss)
+
+
+def record_report(**details):
+    """
+    Note what the run reported on (repo, branch, table row counts...) in its summary
+    """
+    recorder.report.update(details)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from datetime import datetime
+from lib import fetch
+
+
+class PRCollection:
+    """
+    In-memory PR records keyed by number, fetched once and read by
+    several consumers (the report tables and the label reconciliation).
+    A PR seen by more than one search is only held once, the latest copy wins.
+    """
+
+    def __init__(self):
+        self.prs = {}
+
+    def __len__(self):
+        return len(self.prs)
+
+    def add(self, records):
+        """
+        Add PR records, returns how many were added
+        """
+        count = 0
+        for record in records:
+            self.prs[record.number] = record
+            count += 1
+        return count
+
+    def _select(self, keep):
+        return [pr for number, pr in sorted(self.prs.items(), reverse=True) if keep(pr)]
+
+    def open_prs(self, label=None):
+        """
+        Open PRs, only those carrying `label` when one is given
+        """
+        return self._select(lambda pr: pr.state == 'open' and (label is None or label in pr.labels))
+
+    def merged_since(self, date_str):
+        """
+        PRs merged on or after a YYYY-MM-DD date, as the `merged:>=` search qualifier does
+        """
+        since = datetime.strptime(date_str, '%Y-%m-%d')
+        return self._select(lambda pr: pr.merged_at is not None and pr.merged_at >= since)
+
+
+def fetch_collection(gh, repo, merged_since, merged_required=(), backend='rest', gh_token=None, num_workers=1,
+                     base=None):
+    """
+    Fetch the open PRs (with their draft flag) and the PRs merged since a
+    YYYY-MM-DD date once, into one PRCollection. With `base` only PRs
+    targeting that branch are fetched. Without `merged_since` only the
+    open PRs are (merged PRs are then found in the git history).
+    """
+    collection = PRCollection()
+    print("- Retrieving open Pull Requests from Github")
+    collection.add(fetch.search_prs(gh, repo, f"{fetch.repo_query(repo, base)} is:open is:pr", ('draft',),
+                                    backend, gh_token, num_workers))
+    if merged_since:
+        print("- Retrieving Pull Requests merged since %s from Github" % merged_since)
+        collection.add(fetch.search_prs(gh, repo,
+                                        f"{fetch.repo_query(repo, base)} is:pr is:merged merged:>={merged_since}",
+                                        merged_required, backend, gh_token, num_workers))
+    print("- %s Pull Requests held in memory" % len(collection))
+    return collection
+
+
+def refresh_collection(collection, gh, repo, updated_since, merged_required=(), backend='rest', gh_token=None,
+                       num_workers=1, base=None):
+    """
+    Bring a PRCollection up to date with one search for the PRs updated
+    since an ISO 8601 timestamp. Updated PRs replace the held copy, PRs
+    closed without being merged are dropped. Returns how many PRs changed.
+    """
+    print("- Retrieving Pull Requests updated since %s from Github" % updated_since)
+    changed = 0
+    for record in fetch.search_prs(gh, repo, f"{fetch.repo_query(repo, base)} is:pr updated:>={updated_since}",
+                                   ('draft',) + tuple(merged_required), backend, gh_token, num_workers):
+        if record.state == 'closed' and record.merged_at is None:
+            collection.prs.pop(record.number, None)
+        else:
+            collection.add([record])
+        changed += 1
+    print("- %s Pull Requests changed, %s held in memory" % (changed, len(collection)))
+    return changed
+
+
+def load_collection(store, repo_name, merged_since):
+    """
+    The same PRs as fetch_collection(), read from a synced PR store
+    """
+    collection = PRCollection()
+    collection.add(store.open_prs(repo_name))
+    collection.add(store.merged_since(repo_name, merged_since))
+    return collection
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import sqlite3
+from datetime import datetime
+from lib import fetch
+from lib import pulls
+
+STORE_FILE_NAME = "acs_trawler_prs.sqlite"
+
+DATE_FIELDS = ('created_at', 'updated_at', 'merged_at')
+
+
+class PRStore:
+    """
+    On-disk store of normalised PR records, one table per kind of fact:
+    `prs` holds the records, `sync_state` when each repo was last synced.
+    Records go in and come out as pulls.PRRecord.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.migrate()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS prs (
+                repo TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                title TEXT,
+                labels TEXT,
+                draft INTEGER,
+                state TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                merged_at TEXT,
+                merge_commit_sha TEXT,
+                ticked TEXT,
+                PRIMARY KEY (repo, number)
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                repo TEXT PRIMARY KEY,
+                last_sync TEXT NOT NULL,
+                merged_since TEXT NOT NULL
+            );
+        """)
+
+    def migrate(self):
+        """
+        Stores written before records kept ticked checkboxes hold whole
+        bodies instead, drop their PRs and sync state so the next sync is a full crawl
+        """
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(prs)")]
+        if columns and 'ticked' not in columns:
+            print("- PR store predates ticked checkboxes, rebuilding it")
+            self.conn.executescript("DROP TABLE prs; DROP TABLE IF EXISTS sync_state;")
+
+    def close(self):
+        self.conn.close()
+
+    def get_sync_state(self, repo_name):
+        """
+        Return (last_sync, merged_since) for a repo, or (None, None) if never synced
+        """
+        row = self.conn.execute("SELECT last_sync, merged_since FROM sync_state WHERE repo = ?",
+                                (repo_name,)).fetchone()
+        if not row:
+            return None, None
+        return row[0], row[1]
+
+    def set_sync_state(self, repo_name, last_sync, merged_since):
+        self.conn.execute("INSERT OR REPLACE INTO sync_state (repo, last_sync, merged_since) VALUES (?, ?, ?)",
+                          (repo_name, last_sync, merged_since))
+        self.conn.commit()
+
+    def upsert(self, repo_name, records):
+        """
+        Insert or replace PR records, returns how many were written
+        """
+        count = 0
+        for record in records:
+            row = [repo_name]
+            for field in pulls.RECORD_FIELDS:
+                value = getattr(record, field)
+                if field in ('labels', 'ticked'):
+                    value = json.dumps(sorted(value))
+                elif field in DATE_FIELDS and value is not None:
+                    value = value.strftime('%Y-%m-%dT%H:%M:%SZ')
+                elif field == 'draft' and value is not None:
+                    value = int(value)
+                row.append(value)
+            self.conn.execute("INSERT OR REPLACE INTO prs (repo, %s) VALUES (?, %s)"
+                              % (', '.join(pulls.RECORD_FIELDS), ', '.join('?' * len(pulls.RECORD_FIELDS))), row)
+            count += 1
+        self.conn.commit()
+        return count
+
+    def _select(self, where, params):
+        cursor = self.conn.execute("SELECT %s FROM prs WHERE %s ORDER BY number DESC"
+                                   % (', '.join(pulls.RECORD_FIELDS), where), params)
+        for row in cursor:
+            record = dict(zip(pulls.RECORD_FIELDS, row))
+            record['labels'] = json.loads(record['labels'])
+            record['ticked'] = json.loads(record['ticked'])
+            record['draft'] = None if record['draft'] is None else bool(record['draft'])
+            for field in DATE_FIELDS:
+                record[field] = pulls.parse_gh_date(record[field])
+            yield pulls.PRRecord(**record)
+
+    def open_prs(self, repo_name):
+        return self._select("repo = ? AND state = 'open'", (repo_name,))
+
+    def get_prs(self, repo_name, numbers):
+        """
+        The stored PRs among `numbers`, newest first
+        """
+        numbers = sorted(numbers, reverse=True)
+        # stay well under SQLite's limit on bound parameters
+        for start in range(0, len(numbers), 500):
+            chunk = numbers[start:start + 500]
+            yield from self._select("repo = ? AND number IN (%s)" % ', '.join('?' * len(chunk)),
+                                    [repo_name] + chunk)
+
+    def merged_since(self, repo_name, date_str):
+        """
+        PRs merged on or after a YYYY-MM-DD date, as the `merged:>=` search qualifier does
+        """
+        return self._select("repo = ? AND merged_at >= ?", (repo_name, date_str))
+
+
+def store_key(repo_name, base=None):
+    """
+    What a repo's PRs are stored under, PRs of one base branch are kept apart from the whole repo's
+    """
+    return "%s@%s" % (repo_name, base) if base else repo_name
+
+
+def sync(store, gh, repo, merged_since, backend='rest', gh_token=None, base=None):
+    """
+    Bring the store up to date for `repo` (only PRs targeting `base` when given).
+    The first sync (or one reaching further back than before) crawls open PRs
+    and PRs merged since `merged_since`. Later syncs only ask for PRs updated
+    since the previous sync started.
+    """
+    repo_name = store_key(repo.full_name, base)
+    query = fetch.repo_query(repo, base)
+    last_sync, stored_merged_since = store.get_sync_state(repo_name)
+    sync_started = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+    # merge_commit_sha is needed for revert checks, records only need it fetching once
+    required = ('merge_commit_sha',)
+
+    if last_sync and stored_merged_since <= merged_since:
+        print("- Syncing PR store with PRs updated since %s" % last_sync)
+        search_strings = [f"{query} is:pr updated:>={last_sync}"]
+    else:
+        print("- Populating PR store, this is a full crawl")
+        search_strings = [f"{query} is:open is:pr",
+                          f"{query} is:pr is:merged merged:>={merged_since}"]
+        stored_merged_since = merged_since
+
+    updated = 0
+    for search_string in search_strings:
+        updated += store.upsert(repo_name, fetch.search_prs(gh, repo, search_string, required, backend, gh_token))
+    store.set_sync_state(repo_name, sync_started, stored_merged_since)
+    print("- %s PR records updated in %s" % (updated, store.path))
@@ -19,75 +19,86 @@
 # under the License.
 
 
-import os
 import re
-import subprocess
 from datetime import datetime
-import subprocess
-import shutil
 import pygit2
+from lib import git_mirror
+from lib import revert_index
 
-def get_commits(repo, branch, tmp_dir):
+# subjects of the commits Github writes when merging or squash merging a PR
+merge_pull_request = re.compile(r'^Merge pull request #(\d+)')
+squash_merge = re.compile(r'\(#(\d+)\)$')
 
-    global prev_release_commit_date
+def walk_commits(mirror, branch, since_date=None, hide=None):
+    """
+    Walk `branch` newest first with pygit2, stopping once commits are older
+    than since_date, so only the release window is read. Commits reachable
+    from `hide` are skipped.
+    """
+    tip = mirror.revparse_single('refs/heads/' + branch)
+    walker = mirror.walk(tip.id, pygit2.GIT_SORT_TIME)
+    if hide:
+        walker.hide(hide)
+    for commit in walker:
+        commit_date = datetime.utcfromtimestamp(commit.commit_time + commit.commit_time_offset * 60).date()
+        if since_date and commit_date < since_date:
+            break
+        yield commit
 
-    leading_4_spaces = re.compile('^    ')
+def get_reverted_commits(mirror, branch, prev_release_commit_date, tmp_repo_dir):
+    """
+    Return the set of SHAs reverted on `branch` since the previous release,
+    served from a revert index kept next to the (already synced) mirror in tmp_repo_dir
+    """
+    previous_commit_date = datetime.strptime(prev_release_commit_date, '%Y-%m-%d').date()
+    # runs for other branches of the same repo share the mirror and its index
+    with git_mirror.mirror_lock(tmp_repo_dir.rstrip('/') + ".reverts"):
+        index = revert_index.RevertIndex(tmp_repo_dir.rstrip('/') + ".reverts.json")
+        index.update(mirror, branch, previous_commit_date, walk_commits)
+        index.save()
+    return index.reverted_since(branch, previous_commit_date)
 
-    print("- Cloning repo to avoid too many Github API calls, sorry, this could take a while")
-    dir_now = os.getcwd()
-    #if os.path.isdir(tmp_repo_dir):
-    #    shutil.rmtree(tmp_repo_dir)
-    #os.mkdir(tmp_repo_dir)
-    os.chdir(tmp_dir)
-    repoClone = pygit2.clone_repository(repo.git_url, tmp_dir, bare=True, checkout_branch=branch)
-    lines = subprocess.check_output(
-        ['git', 'log'], stderr=subprocess.STDOUT
-            ).decode("utf-8").split("\n")
-    commits = []
-    current_commit = {}
-    def save_current_commit():
-        title = current_commit['message'][0]
-        message = current_commit['message'][1:]
-        if message and message[0] == '':
-            del message[0]
-        current_commit['title'] = title
-        current_commit['message'] = '\n'.join(message)
-        commits.append(current_commit)
-    for line in lines:
-        if not line.startswith(' '):
-            if line.startswith('commit '):
-                if current_commit:
-                    save_current_commit()
-                    current_commit = {}
-                current_commit['hash'] = line.split('commit ')[1]
-            else:
-                try:
-                    key, value = line.split(':', 1)
-                    current_commit[key.lower()] = value.strip()
-                except ValueError:
-                    pass
-        else:
-            current_commit.setdefault(
-                'message', []
-            ).append(leading_4_spaces.sub('', line))
-    if current_commit:
-        save_current_commit()
-    os.chdir(dir_now)
-    return commits
 
-def get_reverted_commits(repo, branch, prev_release_commit_date, tmp_repo_dir):
+def pr_number_of(commit):
+    """
+    The number of the PR a merge or squash merge commit brought in, from its subject, or None
+    """
+    subject = commit.message.split('\n', 1)[0].strip()
+    match = merge_pull_request.match(subject) or squash_merge.search(subject)
+    return int(match.group(1)) if match else None
 
-    revertedcommits = []
-    previous_commit_date = datetime.strptime(prev_release_commit_date, '%Y-%m-%d').date()
-    commits = get_commits(repo, branch, tmp_repo_dir)
-    for commit in commits:
-        thiscommit = commit['title']
-        reverted = re.match('^Revert "', thiscommit)
-        if reverted:
-            commitdatestr = commit['date']
-            date_time_str = ' '.join(commitdatestr.split(" ")[:-1])
-            commitdate = datetime.strptime(date_time_str, '%c').date()
-            if commitdate > previous_commit_date:
-                revertedcommit = re.search('.*This reverts commit ([A-Za-z0-9]*).*', commit['message'])
-                revertedcommits.append(revertedcommit.group(1))
-    return revertedcommits
+
+def get_release_prs(mirror, branch, prev_release_sha):
+    """
+    The PRs merged into `branch` since the previous release by the git
+    history of the (already synced) mirror: prev_release_sha..branch, merge
+    and squash commits mapped to their PR numbers. PRs whose every commit
+    is reverted within the same range are left out. Returns {number: SHA},
+    or None when the release commit isn't in the mirror.
+    """
+    try:
+        if prev_release_sha not in mirror:
+            return None
+    except ValueError:
+        return None
+    tip = mirror.revparse_single('refs/heads/' + branch)
+    walker = mirror.walk(tip.id, pygit2.GIT_SORT_TIME)
+    walker.hide(prev_release_sha)
+    commits = {}
+    reverted = set()
+    for commit in walker:
+        reverted_sha = revert_index.revert_of(commit)
+        if reverted_sha:
+            reverted.add(reverted_sha)
+            continue
+        number = pr_number_of(commit)
+        if number is not None:
+            commits.setdefault(number, []).append(str(commit.id))
+    release_prs = {}
+    for number, shas in commits.items():
+        kept = [sha for sha in shas if sha not in reverted]
+        if kept:
+            release_prs[number] = kept[0]
+    print("- %s PRs merged into '%s' since %s, %s left out as reverted"
+          % (len(release_prs), branch, prev_release_sha[:10], len(commits) - len(release_prs)))
+    return release_prs
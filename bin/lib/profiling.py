@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import atexit
+import cProfile
+import os
+import sys
+import threading
+import time
+
+# seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+
+class StackSampler:
+    """
+    Samples the stack of every thread each `interval` seconds and counts
+    identical stacks, giving the collapsed ("folded") format flamegraph.pl
+    and speedscope read. Unlike cProfile it also sees the worker threads.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="stack-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while self.running:
+            names = dict((thread.ident, thread.name) for thread in threading.enumerate())
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append("%s (%s)" % (code.co_name, os.path.basename(code.co_filename)))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, "thread-%s" % thread_id))
+                key = ';'.join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def write(self, path):
+        with open(path, "w") as collapsed_file:
+            for stack, count in sorted(self.stacks.items()):
+                collapsed_file.write("%s %s\n" % (stack, count))
+
+
+def start(output_dir, name):
+    """
+    Profile the rest of the run: cProfile on the calling thread and a stack
+    sampler over all threads. <name>.pstats and <name>.collapsed are
+    written to `output_dir` when the process exits, however it exits.
+    """
+    profiler = cProfile.Profile()
+    sampler = StackSampler()
+
+    def finish():
+        profiler.disable()
+        sampler.stop()
+        pstats_path = os.path.join(output_dir, name + ".pstats")
+        collapsed_path = os.path.join(output_dir, name + ".collapsed")
+        profiler.dump_stats(pstats_path)
+        sampler.write(collapsed_path)
+        print("- Profile written to %s (%s stack samples in %s)" % (pstats_path, sampler.samples, collapsed_path))
+
+    atexit.register(finish)
+    print("- Profiling this run, output goes to %s" % output_dir)
+    sampler.start()
+    profiler.enable()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import threading
+from datetime import datetime
+from lib import checkboxes
+
+# Fields a PR record carries. Everything apart from merge_commit_sha is
+# present in the search/issues payload, so get_pull is only needed for that.
+PR_FIELDS = ('number', 'title', 'labels', 'body', 'draft', 'state',
+             'created_at', 'updated_at', 'merged_at', 'merge_commit_sha')
+
+# What a frozen PRRecord keeps: the body is reduced to its ticked type checkboxes
+RECORD_FIELDS = ('number', 'title', 'labels', 'draft', 'state', 'created_at', 'updated_at',
+                 'merged_at', 'merge_commit_sha', 'ticked')
+
+SEVERITY_INDEX = {"BLOCKER": "01", "Critical": "02", "Major": "03", "Minor": "04", "Trivial": "05",
+                  "none": "98", "unmatched": "99"}
+
+request_stats = {'pulls_fetched': 0, 'pulls_saved': 0}
+stats_lock = threading.Lock()
+
+
+def severity_of(labels):
+    """
+    The severity named by the one 'Severity:...' label of a PR and its
+    sort index, 'unmatched' when there is no such label or more than one
+    """
+    severities = [label[9:] for label in labels if "Severity" in label]
+    severity = severities[0] if len(severities) == 1 else "unmatched"
+    return severity, SEVERITY_INDEX.get(severity, SEVERITY_INDEX["unmatched"])
+
+
+class PRRecord:
+    """
+    The immutable facts the report and the reconciler need about one PR,
+    built once per PR. Labels and ticked checkboxes are frozensets, no
+    PyGithub object or raw JSON is kept, so reading a field never makes a
+    request and records pickle cheaply.
+    """
+
+    __slots__ = RECORD_FIELDS + ('severity', 'severity_index')
+
+    def __init__(self, number, title, labels, draft, state, created_at, updated_at, merged_at,
+                 merge_commit_sha, ticked):
+        values = dict(number=number, title=title, labels=frozenset(labels), draft=draft, state=state,
+                      created_at=created_at, updated_at=updated_at, merged_at=merged_at,
+                      merge_commit_sha=merge_commit_sha, ticked=frozenset(ticked))
+        values['severity'], values['severity_index'] = severity_of(values['labels'])
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PRRecord is immutable")
+
+    def __reduce__(self):
+        return PRRecord, tuple(getattr(self, field) for field in RECORD_FIELDS)
+
+    def __repr__(self):
+        return "PRRecord(#%s %r)" % (self.number, self.title)
+
+
+def freeze(record):
+    """
+    Build a PRRecord from a PR record dict, parsing the body once for ticked type checkboxes
+    """
+    return PRRecord(record['number'], record['title'], record['labels'], record['draft'], record['state'],
+                    record['created_at'], record['updated_at'], record['merged_at'], record['merge_commit_sha'],
+                    checkboxes.type_parser.ticked(record['body']))
+
+
+def replace(record, **changes):
+    """
+    A copy of a PRRecord with some fields changed, records themselves never change
+    """
+    values = dict((field, getattr(record, field)) for field in RECORD_FIELDS)
+    values.update(changes)
+    return PRRecord(**values)
+
+
+def parse_gh_date(date_str):
+    """
+    Turn a Github ISO8601 timestamp into a naive UTC datetime (as PyGithub does)
+    """
+    if not date_str:
+        return None
+    return datetime.strptime(date_str, '%Y-%m-%dT%H:%M:%SZ')
+
+
+def record_from_raw(raw):
+    """
+    Build a PR record dict from the JSON of a search result issue
+    """
+    pull_request = raw.get('pull_request') or {}
+    return {
+        'number': raw['number'],
+        'title': raw.get('title') or '',
+        'labels': [l['name'] for l in raw.get('labels', [])],
+        'body': raw.get('body'),
+        'draft': raw.get('draft'),
+        'state': raw.get('state'),
+        'created_at': parse_gh_date(raw.get('created_at')),
+        'updated_at': parse_gh_date(raw.get('updated_at')),
+        'merged_at': parse_gh_date(pull_request.get('merged_at')),
+        'merge_commit_sha': raw.get('merge_commit_sha'),
+    }
+
+
+def record_from_pull(pull):
+    """
+    Build a PR record dict from the JSON of a pull (or a webhook's pull_request), which carries merged_at directly
+    """
+    record = record_from_raw(pull)
+    record['merged_at'] = parse_gh_date(pull.get('merged_at'))
+    return record
+
+
+def missing_fields(record, required):
+    """
+    The `required` fields a record still needs the full pull for
+    """
+    # open PRs have no merge commit yet, there is nothing to fetch for them
+    return [field for field in required if record[field] is None
+            and not (field == 'merge_commit_sha' and record['state'] == 'open')]
+
+
+def build_pr_record(raw, repo, required=()):
+    """
+    Build a PR record dict from the JSON of a search result issue.
+    Only calls repo.get_pull() when one of the `required` fields is missing
+    from the search payload.
+    """
+    record = record_from_raw(raw)
+    if missing_fields(record, required):
+        pr = repo.get_pull(record['number'])
+        with stats_lock:
+            request_stats['pulls_fetched'] += 1
+        record['draft'] = pr.draft
+        # newer PyGithub hands back aware datetimes, keep records naive UTC
+        if pr.merged_at is not None:
+            record['merged_at'] = pr.merged_at.replace(tzinfo=None)
+        record['merge_commit_sha'] = pr.merge_commit_sha
+    else:
+        with stats_lock:
+            request_stats['pulls_saved'] += 1
+    return record
+
+
+def print_request_stats():
+    print("- Built PR records from search results: %s get_pull requests saved, %s made"
+          % (request_stats['pulls_saved'], request_stats['pulls_fetched']))
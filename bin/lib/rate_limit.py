@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+# Github's documented budgets, reported until the first response says otherwise
+DEFAULT_LIMITS = {'core': 5000, 'search': 30, 'graphql': 5000}
+# below this share of the budget left, requests are spread out until the reset
+RESERVE_FRACTION = 0.1
+SECONDARY_BACKOFF = 60
+MAX_RETRIES = 5
+
+scheduler = None
+
+
+def split_tokens(gh_token):
+    """
+    --gh_token can be one token, a comma separated list or a JSON list
+    """
+    if isinstance(gh_token, (list, tuple)):
+        tokens = gh_token
+    else:
+        tokens = str(gh_token).split(',')
+    return [token.strip() for token in tokens if token and token.strip()]
+
+
+def resource_for(url):
+    """
+    Which rate limit bucket a request path is charged to
+    """
+    if '/search/' in url:
+        return 'search'
+    if url.rstrip('/').endswith('/graphql'):
+        return 'graphql'
+    return 'core'
+
+
+def header(headers, name):
+    for key, value in headers.items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+class RateLimitScheduler:
+    """
+    Paces requests against the core, search and graphql budgets of one or
+    more tokens, using the X-RateLimit-* headers of every response.
+    acquire() hands out the token with the most budget left and sleeps
+    when all of them are nearly spent. `clock` and `sleep` stand in for
+    time.time and time.sleep.
+    """
+
+    def __init__(self, tokens, clock=time.time, sleep=time.sleep):
+        self.tokens = list(tokens)
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.budgets = {}
+        self.last_request = {}
+        for token in self.tokens:
+            for resource, limit in DEFAULT_LIMITS.items():
+                self.budgets[(token, resource)] = {'limit': limit, 'remaining': limit, 'reset': 0}
+        self.waited = 0.0
+        self.backoffs = 0
+        self.used = {}
+
+    def _refresh(self, budget, now):
+        if budget['reset'] and now >= budget['reset']:
+            budget['remaining'] = budget['limit']
+            budget['reset'] = 0
+
+    def acquire(self, resource):
+        """
+        Pick a token for the next `resource` request, sleeping first if the budget needs pacing
+        """
+        while True:
+            with self.lock:
+                now = self.clock()
+                for token in self.tokens:
+                    self._refresh(self.budgets[(token, resource)], now)
+                token = max(self.tokens, key=lambda t: self.budgets[(t, resource)]['remaining'])
+                budget = self.budgets[(token, resource)]
+                delay = 0.0
+                # until a response has reported the budget and its reset (a server
+                # with rate limiting off never does) there is nothing to pace against
+                known = budget['reset'] != 0
+                if known and budget['remaining'] <= 0:
+                    delay = max(budget['reset'] - now, 1)
+                elif known and budget['remaining'] < budget['limit'] * RESERVE_FRACTION:
+                    # spread what is left over the time until the reset
+                    interval = (budget['reset'] - now) / budget['remaining']
+                    delay = self.last_request.get((token, resource), 0) + interval - now
+                if delay <= 0:
+                    if known:
+                        budget['remaining'] -= 1
+                    self.used[resource] = self.used.get(resource, 0) + 1
+                    self.last_request[(token, resource)] = now
+                    return token
+                self.waited += delay
+            print("- Pacing %s requests, waiting %.1fs for the rate limit" % (resource, delay))
+            self.sleep(delay)
+
+    def update(self, token, resource, headers):
+        """
+        Record the budget reported by a response
+        """
+        remaining = header(headers, 'X-RateLimit-Remaining')
+        if remaining is None:
+            return
+        # Github names the bucket it charged, trust it over our guess
+        resource = header(headers, 'X-RateLimit-Resource') or resource
+        with self.lock:
+            budget = self.budgets.setdefault((token, resource), {'limit': 0, 'remaining': 0, 'reset': 0})
+            budget['remaining'] = int(remaining)
+            limit = header(headers, 'X-RateLimit-Limit')
+            if limit is not None:
+                budget['limit'] = int(limit)
+            reset = header(headers, 'X-RateLimit-Reset')
+            if reset is not None:
+                budget['reset'] = int(reset)
+
+    def backoff(self, token, resource, status, headers, body, attempt):
+        """
+        Return how long to wait before retrying a rate limited response, or None if it wasn't one
+        """
+        if status not in (403, 429):
+            return None
+        retry_after = header(headers, 'Retry-After')
+        if retry_after is not None:
+            delay = int(retry_after)
+        elif 'secondary rate limit' in (body or '').lower():
+            delay = SECONDARY_BACKOFF * (2 ** attempt)
+        elif header(headers, 'X-RateLimit-Remaining') == '0':
+            reset = header(headers, 'X-RateLimit-Reset')
+            delay = max(int(reset) - self.clock(), 1) if reset else SECONDARY_BACKOFF
+            # another token may still have budget
+            if len(self.tokens) > 1:
+                delay = 0
+        else:
+            return None
+        with self.lock:
+            self.backoffs += 1
+            self.waited += delay
+        return delay
+
+    def consumption(self):
+        """
+        Per resource: requests charged by this run, and the budget left and granted across all tokens
+        """
+        with self.lock:
+            consumption = {}
+            for (token, resource), budget in self.budgets.items():
+                entry = consumption.setdefault(resource, {'used': self.used.get(resource, 0),
+                                                          'remaining': 0, 'limit': 0})
+                entry['remaining'] += budget['remaining']
+                entry['limit'] += budget['limit']
+            return consumption
+
+    def print_stats(self):
+        print("- Rate limit scheduler: %s tokens, %s backoffs, %.1fs spent waiting"
+              % (len(self.tokens), self.backoffs, self.waited))
+        with self.lock:
+            for (token, resource), budget in sorted(self.budgets.items(), key=lambda item: item[0][1]):
+                if budget['reset']:
+                    print("-- token ...%s %s: %s/%s left" % (token[-4:], resource, budget['remaining'], budget['limit']))
+
+
+class SchedulerServer(BaseManager):
+    pass
+
+
+class SchedulerClient(BaseManager):
+    pass
+
+
+SchedulerClient.register('get_scheduler')
+
+
+class SharedScheduler:
+    """
+    Stands in for a RateLimitScheduler living in another process (see
+    serve_shared), so several processes pace their requests against one
+    budget. Calls go over a multiprocessing manager connection per thread.
+    """
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.tokens = proxy.get_tokens()
+
+    def acquire(self, resource):
+        return self.proxy.acquire(resource)
+
+    def update(self, token, resource, headers):
+        self.proxy.update(token, resource, dict(headers))
+
+    def backoff(self, token, resource, status, headers, body, attempt):
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', 'replace')
+        return self.proxy.backoff(token, resource, status, dict(headers), body, attempt)
+
+    def consumption(self):
+        return self.proxy.consumption()
+
+    def print_stats(self):
+        print("- Rate limit scheduler shared with other processes, %s tokens" % len(self.tokens))
+
+
+def serve_shared(tokens):
+    """
+    Serve one RateLimitScheduler for `tokens` to other processes from a
+    thread of this one. Returns (the scheduler, "host:port", authkey) for
+    connect_shared().
+    """
+    shared = RateLimitScheduler(tokens)
+    shared.get_tokens = lambda: shared.tokens
+    authkey = os.urandom(16)
+    SchedulerServer.register('get_scheduler', callable=lambda: shared,
+                             exposed=('acquire', 'update', 'backoff', 'consumption', 'get_tokens'))
+    server = SchedulerServer(address=('127.0.0.1', 0), authkey=authkey).get_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.address
+    return shared, "%s:%s" % (host, port), authkey.hex()
+
+
+def connect_shared(address, authkey):
+    """
+    A SharedScheduler talking to the scheduler another process serves with serve_shared()
+    """
+    host, port = address.rsplit(':', 1)
+    manager = SchedulerClient(address=(host, int(port)), authkey=bytes.fromhex(authkey))
+    manager.connect()
+    return SharedScheduler(manager.get_scheduler())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+from datetime import datetime, timedelta
+from lib import checkboxes
+from lib import render
+from lib import workers
+
+LABEL_NAMES = checkboxes.TYPE_CHECKBOXES
+DRAFT_PR_LABEL = "wip"
+
+
+def new_tables(col_title_width=60):
+    """
+    Return the (tables, counts) the label checks report into
+    """
+    tables = {}
+    for table_name in ('labels_added', 'labels_all_bad', 'labels_mismatch', 'labels_old'):
+        tables[table_name] = render.Table(["PR Number", "Title", "PR Type", "Result"],
+                                          align={"Title": "l", "Result": "l"},
+                                          max_width={"Title": col_title_width})
+    tables['labels_added'].align["PR Type"] = "l"
+    counts = dict.fromkeys(['labels_added', 'labels_mismatched', 'labels_all_bad',
+                            'labels_matched', 'old_prs'], 0)
+    return tables, counts
+
+
+def label_match(pr, existing_label_names):
+    """
+    Compare the type labels on a PR with the ticked type checkboxes in its description.
+    Returns the match counters for this PR.
+    """
+    match = {'matched': 0, 'mismatch': 0, 'no_match': 0, 'desc_exist': 0,
+             'label_exist': 0, 'missing_labels': 0, 'label_to_add': ''}
+    for label_string in LABEL_NAMES:
+        if label_string != "type:healthcheckrun":
+            if label_string in pr.ticked:
+                match['desc_exist'] += 1
+                if label_string in existing_label_names:
+                    match['label_exist'] += 1
+                    match['matched'] += 1
+                else:
+                    match['label_to_add'] = label_string
+                    match['missing_labels'] += 1
+                    match['mismatch'] += 1
+            else:
+                if label_string in existing_label_names:
+                    match['label_exist'] += 1
+                    match['mismatch'] += 1
+                else:
+                    match['no_match'] += 1
+    return match
+
+
+def label_reconcile(pr, prtype_text, match, result):
+    """
+    Decide what to report (and fix) for a PR given its label_match() counters.
+    Table rows and counters are added to `result` for the main thread to apply.
+    """
+    pr_num = str(pr.number)
+    label_to_add = match['label_to_add']
+
+    if match['matched'] == 1:
+        result['counts'].append('labels_matched')
+        result['log'].append("---- Matching label found - no action")
+    else:
+        if match['desc_exist'] > 1 or match['label_exist'] > 1:
+            result['log'].append("XXXX Too many label or description matches")
+            result['rows'].append(('labels_mismatch', [pr_num, pr.title.strip(), prtype_text, "Label/description mismatch"]))
+            result['counts'].append('labels_mismatched')
+        else:
+            if match['desc_exist'] > 0 and match['label_exist'] > 0:
+                result['log'].append("XXXX Label and description don't match")
+                result['rows'].append(('labels_mismatch', [pr_num, pr.title.strip(), prtype_text, "Label/description mismatch"]))
+                result['counts'].append('labels_mismatched')
+
+            elif (match['label_exist'] > 0 and match['desc_exist'] == 0):
+                result['log'].append("XXX Label without description")
+                result['rows'].append(('labels_mismatch', [pr_num, pr.title.strip(), prtype_text, "Label without description"]))
+                result['counts'].append('labels_mismatched')
+
+            elif match['desc_exist'] == 1 and match['label_exist'] == 0:
+                result['counts'].append('labels_added')
+                add_label_res =  "++++ label '" + label_to_add[5:] + "' added"
+                result['log'].append(add_label_res)
+                add_label_text = add_label_res[5:]
+                result['rows'].append(('labels_added', [pr_num, pr.title.strip(), prtype_text, add_label_text]))
+                result['labels'].append((pr, 'add', label_to_add))
+
+            elif match['no_match'] == len(LABEL_NAMES):
+                result['counts'].append('labels_all_bad')
+                result['rows'].append(('labels_all_bad', [pr_num, pr.title.strip(), prtype_text, "No label or description"]))
+                result['log'].append("XXXX No type labels or type in description")
+            else:
+                result['log'].append("**** Something went wrong, I'm confused")
+
+
+def check_open_pr(pr):
+    """
+    Check the draft/wip and age labels and the type label of an open PR.
+    Runs on worker threads, so it only returns what to report.
+    """
+    result = workers.new_result()
+    pr_num = str(pr.number)
+    is_draft = pr.draft
+    result['log'].append("\n-- Checking OPEN pr#: " + pr_num)
+    existing_label_names = list(pr.labels)
+
+    if is_draft:
+        prtype = 'Draft PR'
+        if DRAFT_PR_LABEL not in existing_label_names:
+            result['log'].append("**** Daft PR missing wip label - adding label")
+            result['rows'].append(('labels_added', [pr_num, pr.title.strip(), prtype, "WIP label added"]))
+            result['counts'].append('labels_added')
+            result['labels'].append((pr, 'add', "status:work-in-progress"))
+    if not is_draft:
+        prtype = 'Open PR'
+        if DRAFT_PR_LABEL in existing_label_names:
+            result['log'].append("**** PR with incorrect wip label - removing label")
+            result['rows'].append(('labels_added', [pr_num, pr.title.strip(), prtype, "WIP label removed"]))
+            result['counts'].append('labels_added')
+            result['labels'].append((pr, 'remove', "status:work-in-progress"))
+    
+    creation_date = pr.created_at
+    check_date_old = datetime.now() - timedelta(days=365)
+    check_date_very_old = datetime.now() - timedelta(days=2*365)
+    if creation_date < check_date_very_old:
+        result['log'].append("**** More than 2 years old - adding label")
+        result['counts'].append('old_prs')
+        result['rows'].append(('labels_old', [pr_num, pr.title.strip(), "Very old PR", "Add label age:2years_plus"]))
+        result['labels'].append((pr, 'add', "age:2years_plus"))
+        result['labels'].append((pr, 'remove', "age:1year_plus"))
+
+    elif creation_date < check_date_old:
+        result['log'].append("**** More than 1 year old - adding label")
+        result['counts'].append('old_prs')
+        result['rows'].append(('labels_old', [pr_num, pr.title.strip(), "Old PR", "Add label age:1year_plus"]))
+        result['labels'].append((pr, 'add', "age:1year_plus"))
+
+    label_reconcile(pr, prtype, label_match(pr, existing_label_names), result)
+    return result
+
+
+def check_merged_pr(pr):
+    """
+    Check the type label of a merged PR.
+    Runs on worker threads, so it only returns what to report.
+    """
+    result = workers.new_result()
+    pr_num = str(pr.number)
+    result['log'].append("\n-- Checking MERGED pr#: " + pr_num)
+    existing_label_names = list(pr.labels)
+    label_reconcile(pr, "MERGED", label_match(pr, existing_label_names), result)
+    return result
+
+
+def write_report(labels_file, repo_name, tables, counts, output_format='rst'):
+    """
+    Write the label check tables to `labels_file` in one of the render.FORMATS.
+    The file is written aside and moved into place, readers never see half of it.
+    """
+    with open(labels_file + ".tmp", "w") as file:
+        renderer = render.get_renderer(output_format, file)
+        renderer.title('Results of ' + repo_name + ' open PR label trawling')
+
+        renderer.note('%s PR labels matched' % str(counts['labels_matched']))
+
+        renderer.heading('Labels Updated in PRs:')
+        renderer.table('labels_added', tables['labels_added'])
+        renderer.note('%s PRs Updated' % str(counts['labels_added']))
+
+        renderer.heading('PR with label not matching description:')
+        renderer.table('labels_mismatch', tables['labels_mismatch'])
+        renderer.note('%s PRs found' % str(counts['labels_mismatched']))
+
+        renderer.heading('PRs without label or description')
+        renderer.table('labels_all_bad', tables['labels_all_bad'])
+        renderer.note('%s Unmatched PRs' % str(counts['labels_all_bad']))
+
+        renderer.heading('Old PRs')
+        renderer.table('labels_old', tables['labels_old'])
+        renderer.note('%s Old PRs' % str(counts['old_prs']))
+    os.replace(labels_file + ".tmp", labels_file)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import csv
+import json
+import textwrap
+
+
+class Table:
+    """
+    The rows of one report table. Rows are kept as plain lists, sorted once
+    on `sort_by` with a keyed sort when rendered. `hidden` columns (like
+    _index) only take part in sorting. `align` and `max_width` map column
+    names to 'l'/'c'/'r' and to the width longer cells are wrapped at.
+    """
+
+    def __init__(self, field_names, sort_by=None, hidden=(), align=None, max_width=None):
+        self.field_names = list(field_names)
+        self.sort_by = sort_by
+        self.hidden = hidden
+        self.align = align or {}
+        self.max_width = max_width or {}
+        self.rows = []
+
+    def add_row(self, row):
+        self.rows.append(row)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def fields(self):
+        return [field for field in self.field_names if field not in self.hidden]
+
+    def sorted_rows(self):
+        """
+        Yield the visible cells of each row as strings, in `sort_by` order.
+        Ties are ordered on the whole row, as PrettyTable orders them.
+        """
+        rows = self.rows
+        if self.sort_by is not None:
+            column = self.field_names.index(self.sort_by)
+            rows = sorted(rows, key=lambda row: (row[column], row))
+        columns = [self.field_names.index(field) for field in self.fields()]
+        for row in rows:
+            yield [str(row[column]) for column in columns]
+
+    def widths(self):
+        """
+        The width of each visible column: its longest cell or header, capped at max_width
+        """
+        widths = []
+        for field in self.fields():
+            column = self.field_names.index(field)
+            width = max([len(field)] + [len(str(row[column])) for row in self.rows])
+            widths.append(min(width, max(self.max_width.get(field, width), len(field))))
+        return widths
+
+
+class Renderer:
+    """
+    Writes a title, section headings, notes and tables to an open file as
+    they come, rows are streamed rather than built into one string
+    """
+
+    def __init__(self, file):
+        self.file = file
+
+    def title(self, text):
+        pass
+
+    def heading(self, text):
+        pass
+
+    def note(self, text):
+        pass
+
+    def table(self, name, table):
+        raise NotImplementedError
+
+
+class RstRenderer(Renderer):
+    """
+    reStructuredText with grid tables, one row separator per row so
+    wrapped titles stay in their own cell
+    """
+
+    def title(self, text):
+        self.file.write('%s\n%s\n\n' % (text, '=' * len(text)))
+
+    def heading(self, text):
+        self.file.write('%s\n\n' % text)
+
+    def note(self, text):
+        self.file.write('%s\n\n' % text)
+
+    def table(self, name, table):
+        widths = table.widths()
+        aligns = [table.align.get(field, 'c') for field in table.fields()]
+        rule = '+' + '+'.join('-' * (width + 2) for width in widths) + '+\n'
+        write = self.file.write
+        write(rule)
+        write(self.row_lines(table.fields(), widths, ['c'] * len(widths)))
+        write(rule.replace('-', '='))
+        for row in table.sorted_rows():
+            write(self.row_lines(row, widths, aligns))
+            write(rule)
+        write('\n')
+
+    @staticmethod
+    def row_lines(cells, widths, aligns):
+        wrapped = [textwrap.wrap(cell, width) or [''] if len(cell) > width else [cell]
+                   for cell, width in zip(cells, widths)]
+        lines = []
+        for line in range(max(len(cell_lines) for cell_lines in wrapped)):
+            parts = []
+            for cell_lines, width, align in zip(wrapped, widths, aligns):
+                text = cell_lines[line] if line < len(cell_lines) else ''
+                if align == 'l':
+                    parts.append(text.ljust(width))
+                elif align == 'r':
+                    parts.append(text.rjust(width))
+                else:
+                    parts.append(text.center(width))
+            lines.append('| ' + ' | '.join(parts) + ' |\n')
+        return ''.join(lines)
+
+
+class MarkdownRenderer(Renderer):
+    """
+    Github flavoured Markdown pipe tables
+    """
+
+    def title(self, text):
+        self.file.write('# %s\n\n' % text)
+
+    def heading(self, text):
+        self.file.write('## %s\n\n' % text)
+
+    def note(self, text):
+        self.file.write('%s\n\n' % text)
+
+    def table(self, name, table):
+        fields = table.fields()
+        write = self.file.write
+        write('| ' + ' | '.join(fields) + ' |\n')
+        write('|' + '|'.join(':---' if table.align.get(field) == 'l' else '---' for field in fields) + '|\n')
+        for row in table.sorted_rows():
+            write('| ' + ' | '.join(cell.replace('|', '\\|').replace('\n', ' ') for cell in row) + ' |\n')
+        write('\n')
+
+
+class CsvRenderer(Renderer):
+    """
+    One block per table: a header row then its rows, each starting with
+    the table name, blocks separated by an empty line
+    """
+
+    def __init__(self, file):
+        super().__init__(file)
+        self.writer = csv.writer(file, lineterminator='\n')
+        self.tables = 0
+
+    def table(self, name, table):
+        if self.tables:
+            self.writer.writerow([])
+        self.tables += 1
+        self.writer.writerow(['table'] + table.fields())
+        for row in table.sorted_rows():
+            self.writer.writerow([name] + row)
+
+
+class JsonLinesRenderer(Renderer):
+    """
+    One JSON object per row, keyed by snake_case column names plus the table name
+    """
+
+    def table(self, name, table):
+        keys = [field.lower().replace(' ', '_') for field in table.fields()]
+        write = self.file.write
+        for row in table.sorted_rows():
+            record = {'table': name}
+            record.update(zip(keys, row))
+            write(json.dumps(record) + '\n')
+
+
+FORMATS = {'rst': RstRenderer, 'markdown': MarkdownRenderer, 'csv': CsvRenderer, 'json': JsonLinesRenderer}
+
+
+def get_renderer(output_format, file):
+    return FORMATS[output_format](file)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from lib import workers
+
+
+class ReportState:
+    """
+    The classification result (see workers.new_result) of every PR in a
+    report, kept per section ('open', 'merged') and PR number. When a PR
+    changes only its own results are replaced, the tables are then
+    rebuilt from the kept results without classifying anything again.
+    """
+
+    def __init__(self, new_tables, sections=('open', 'merged')):
+        self.new_tables = new_tables
+        self.results = dict((section, {}) for section in sections)
+
+    def update(self, section, number, result):
+        """
+        Keep the result of classifying PR `number` for `section`, printing its log lines
+        """
+        for line in result['log']:
+            print(line)
+        self.results[section][number] = result
+
+    def discard(self, number):
+        for results in self.results.values():
+            results.pop(number, None)
+
+    def tables(self, numbers=None):
+        """
+        Return (tables, counts, label changes) built from the kept results,
+        newest PR first within each section. `numbers` limits the label
+        changes to those PRs.
+        """
+        tables, counts = self.new_tables()
+        label_changes = []
+        for results in self.results.values():
+            for number in sorted(results, reverse=True):
+                changes = label_changes if numbers is None or number in numbers else None
+                workers.apply_result(results[number], tables, counts, changes, log=False)
+        return tables, counts, label_changes
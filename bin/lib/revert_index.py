@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import re
+from datetime import datetime
+
+reverts_commit = re.compile('This reverts commit ([A-Za-z0-9]*)')
+
+
+def revert_of(commit):
+    """
+    Return the SHA a 'Revert "..."' commit reverts, or None
+    """
+    if not commit.message.startswith('Revert "'):
+        return None
+    reverted = reverts_commit.search(commit.message)
+    return reverted.group(1) if reverted else None
+
+
+def author_date(commit):
+    """
+    The author date in the author's timezone, as 'git log' prints it
+    """
+    author = commit.author
+    return datetime.utcfromtimestamp(author.time + author.offset * 60).date()
+
+
+class RevertIndex:
+    """
+    On-disk map of reverted SHA -> reverting commit for each branch, along
+    with the branch head it was built up to and the oldest date it covers.
+    History doesn't change, so each run only has to walk the new commits.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.branches = {}
+        if os.path.isfile(path):
+            try:
+                with open(path) as index_file:
+                    self.branches = json.load(index_file)
+            except Exception as e:
+                print("- Ignoring unreadable revert index '%s': %s" % (path, str(e)))
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as index_file:
+            json.dump(self.branches, index_file)
+        os.replace(tmp_path, self.path)
+
+    def update(self, mirror, branch, since_date, walk_commits):
+        """
+        Extend the index for `branch` up to its current tip. Falls back to
+        a walk bounded by since_date when there is nothing to extend, the
+        index starts later than since_date or the branch was rewritten.
+        """
+        tip = mirror.revparse_single('refs/heads/' + branch).id
+        entry = self.branches.get(branch)
+        since_str = since_date.strftime('%Y-%m-%d')
+        hide = None
+        if entry and entry['since'] <= since_str and entry['head'] in mirror \
+                and (entry['head'] == str(tip) or mirror.descendant_of(tip, entry['head'])):
+            hide = entry['head']
+            print("- Extending revert index for '%s' from %s" % (branch, entry['head'][:10]))
+        else:
+            print("- Building revert index for '%s' back to %s" % (branch, since_str))
+            entry = {'since': since_str, 'reverts': {}}
+        for commit in walk_commits(mirror, branch, None if hide else since_date, hide):
+            reverted = revert_of(commit)
+            if reverted:
+                entry['reverts'][reverted] = {'by': str(commit.id),
+                                              'date': author_date(commit).strftime('%Y-%m-%d')}
+        entry['head'] = str(tip)
+        self.branches[branch] = entry
+
+    def reverted_since(self, branch, since_date):
+        """
+        Set of SHAs reverted on `branch` by commits authored after since_date
+        """
+        since_str = since_date.strftime('%Y-%m-%d')
+        reverts = self.branches.get(branch, {}).get('reverts', {})
+        return set(sha for sha, revert in reverts.items() if revert['date'] > since_str)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import re
+from datetime import datetime, timedelta
+
+# the search API silently stops returning results after this many
+SEARCH_CAP = 1000
+# nothing on Github is older than this
+EARLIEST = datetime(2008, 1, 1)
+# ranges are not split below this, a shard that is still too big is reported
+SMALLEST_SHARD = timedelta(minutes=1)
+
+date_qualifier = re.compile(r'\b(merged|created|updated|closed):>=(\S+)')
+
+
+def parse_bound(value):
+    """
+    Parse a YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS(Z) search bound into a naive UTC datetime
+    """
+    value = value.rstrip('Z')
+    if value.endswith('+00:00'):
+        value = value[:-len('+00:00')]
+    for date_format in ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    raise ValueError("Unsupported date in search qualifier: %s" % value)
+
+
+def format_bound(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def split_query(search_string):
+    """
+    Return (query without its date qualifier, field to shard on, range start).
+    Searches without a `field:>=date` qualifier are sharded on `created`.
+    """
+    match = date_qualifier.search(search_string)
+    if not match:
+        return search_string, 'created', EARLIEST
+    base = (search_string[:match.start()] + search_string[match.end():]).strip()
+    return re.sub(r'\s+', ' ', base), match.group(1), parse_bound(match.group(2))
+
+
+def shard_query(base, field, start, end):
+    return "%s %s:%s..%s" % (base, field, format_bound(start), format_bound(end))
+
+
+def plan_shards(search_string, count_fn, now=None):
+    """
+    Split a search into `field:start..end` shards of at most SEARCH_CAP results
+    each, halving date ranges until they fit. `count_fn(query)` returns the
+    total_count of a query. Returns a list of (query, total_count).
+    """
+    base, field, start = split_query(search_string)
+    end = now or datetime.utcnow().replace(microsecond=0)
+    shards = []
+    ranges = [(start, end)]
+    while ranges:
+        range_start, range_end = ranges.pop(0)
+        query = shard_query(base, field, range_start, range_end)
+        total_count = count_fn(query)
+        if total_count <= SEARCH_CAP or range_end - range_start <= SMALLEST_SHARD:
+            if total_count > SEARCH_CAP:
+                print("- WARNING: shard '%s' still has %s results, only %s can be fetched"
+                      % (query, total_count, SEARCH_CAP))
+            if total_count:
+                shards.append((query, total_count))
+            continue
+        middle = range_start + (range_end - range_start) // 2
+        middle = middle.replace(microsecond=0)
+        # bounds are inclusive, so the second half starts a second later
+        ranges[0:0] = [(range_start, middle), (middle + timedelta(seconds=1), range_end)]
+    return shards
@@ -0,0 +1,563 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+A local stand-in for the parts of the Github REST and GraphQL APIs the
+trawler uses, so the clients can be exercised without a token or network
+access. Point --gh_api_url at StubGithubServer.url.
+
+PRs come from synthetic_prs() or from a fixture recorded off the real API
+with record_fixture(). Responses can be delayed to mimic network latency
+and carry X-RateLimit-* headers charged per token, like Github's. GET
+responses carry an ETag and are answered 304 (free of charge) when it
+still matches.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import subprocess
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote, urlencode
+
+TYPE_LABELS = ["type:bug", "type:enhancement", "type:new_feature", "type:cleanup"]
+TYPE_TEXT = {"type:bug": "Bug fix", "type:enhancement": "Enhancement",
+             "type:new_feature": "New feature", "type:cleanup": "Cleanup"}
+# requests per window and window length in seconds, as Github grants a token
+RATE_LIMITS = {'core': (5000, 3600), 'search': (30, 60), 'graphql': (5000, 3600)}
+SEVERITIES = ["Severity:BLOCKER", "Severity:Critical", "Severity:Major", "Severity:Minor", "Severity:Trivial"]
+
+
+def gh_date(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ') if value else None
+
+
+def search_bound(value, upper=False):
+    """
+    A date or datetime search bound as a naive UTC datetime, a bare date
+    used as an upper bound covers the whole day
+    """
+    value = value.rstrip('Z')
+    if value.endswith('+00:00'):
+        value = value[:-len('+00:00')]
+    if 'T' in value:
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S')
+    bound = datetime.strptime(value, '%Y-%m-%d')
+    return bound + timedelta(days=1, seconds=-1) if upper else bound
+
+
+def synthetic_prs(count, seed=0, now=None, bases=('master',)):
+    """
+    `count` PRs spread over the last 3 years: a mix of open, draft, wip,
+    merged and closed PRs with type/severity labels and template checkboxes,
+    each targeting one of the `bases` branches
+    """
+    rng = random.Random(seed)
+    now = now or datetime.utcnow().replace(microsecond=0)
+    prs = {}
+    for number in range(1, count + 1):
+        created_at = now - timedelta(days=3 * 365) + timedelta(seconds=int(3 * 365 * 86400 * number / (count + 1)))
+        state = rng.choice(['open', 'closed', 'closed', 'closed'])
+        merged_at = None
+        if state == 'closed' and rng.random() < 0.85:
+            merged_at = min(created_at + timedelta(days=rng.randint(0, 60)), now)
+        labels = []
+        type_label = rng.choice(TYPE_LABELS + [None])
+        if type_label:
+            labels.append(type_label)
+        if type_label == "type:bug":
+            labels.append(rng.choice(SEVERITIES))
+        draft = state == 'open' and rng.random() < 0.2
+        if state == 'open' and rng.random() < 0.3:
+            labels.append('wip')
+        ticked = type_label if rng.random() < 0.8 else rng.choice(TYPE_LABELS)
+        body = "### Description\n\nSynthetic PR %s\n\n### Types of changes\n\n" % number
+        for label in TYPE_LABELS:
+            body += "- [%s] %s (template text)\n" % ('x' if label == ticked else ' ', TYPE_TEXT[label])
+        prs[number] = {
+            'number': number,
+            'title': "Synthetic PR %s" % number,
+            'labels': labels,
+            'body': body,
+            'draft': draft,
+            'state': state,
+            'created_at': created_at,
+            'updated_at': max(filter(None, [created_at, merged_at])),
+            'merged_at': merged_at,
+            'merge_commit_sha': "%040x" % (0xabc000 + number) if merged_at else None,
+            'base': bases[0] if len(bases) == 1 else rng.choice(bases),
+        }
+    return prs
+
+
+def pr_from_item(item):
+    """
+    A stub PR dict from the JSON of a search result issue (or a pull)
+    """
+    pull_request = item.get('pull_request') or {}
+    merged_at = item.get('merged_at') or pull_request.get('merged_at')
+    return {
+        'number': item['number'],
+        'title': item.get('title') or '',
+        'labels': [l['name'] for l in item.get('labels', [])],
+        'body': item.get('body'),
+        'draft': item.get('draft'),
+        'state': item.get('state'),
+        'created_at': search_bound(item['created_at']),
+        'updated_at': search_bound(item['updated_at']),
+        'merged_at': search_bound(merged_at) if merged_at else None,
+        'merge_commit_sha': item.get('merge_commit_sha'),
+        # search results don't say which branch a PR targets, it then matches any base: qualifier
+        'base': (item.get('base') or {}).get('ref'),
+    }
+
+
+def load_fixture(path):
+    """
+    PRs from a fixture file: a JSON list of search result issues, or of
+    search pages ({'items': [...]}) as record_fixture() writes them
+    """
+    with open(path) as fixture_file:
+        entries = json.load(fixture_file)
+    prs = {}
+    for entry in entries:
+        for item in entry.get('items', [entry]):
+            pr = pr_from_item(item)
+            prs[pr['number']] = pr
+    return prs
+
+
+def record_fixture(gh_token, search_strings, path, api_url="https://api.github.com"):
+    """
+    Save every search result page of `search_strings` from the real API to
+    `path`, to be served again offline with load_fixture()
+    """
+    pages = []
+    for search_string in search_strings:
+        url = "%s/search/issues?%s" % (api_url.rstrip('/'), urlencode({'q': search_string, 'per_page': 100}))
+        while url:
+            request = urllib.request.Request(url, headers={'Authorization': 'token %s' % gh_token,
+                                                           'Accept': 'application/vnd.github.v3+json'})
+            with urllib.request.urlopen(request) as response:
+                pages.append(json.loads(response.read().decode('utf-8')))
+                links = re.findall(r'<([^>]+)>; rel="next"', response.headers.get('Link') or '')
+            url = links[0] if links else None
+            print("- Recorded %s search pages" % len(pages))
+    with open(path, 'w') as fixture_file:
+        json.dump(pages, fixture_file)
+    return len(pages)
+
+
+def synthetic_git_repo(prs, repo_dir, branch='master', revert_every=50):
+    """
+    Build a git repo in `repo_dir` with one commit per PR merged into
+    `branch`, in merge order, then a 'Revert "..."' commit for every `revert_every`th of them.
+    The PRs' merge_commit_sha are set to the real commit SHAs so revert
+    checks have something to find. Returns the reverted SHAs.
+    """
+    merged = sorted((pr for pr in prs.values() if pr['merged_at'] and pr.get('base') in (None, branch)),
+                    key=lambda pr: pr['merged_at'])
+    subprocess.run(['git', 'init', '-q', '--bare', repo_dir], check=True)
+
+    def fast_import(commands, marks_file=None):
+        args = ['git', 'fast-import', '--quiet']
+        if marks_file:
+            args.append('--export-marks=' + marks_file)
+        subprocess.run(args, input=''.join(commands).encode('utf-8'), cwd=repo_dir, check=True)
+
+    def commit(mark, when, message, parent):
+        data = message.encode('utf-8')
+        stamp = int((when - datetime(1970, 1, 1)).total_seconds())
+        return ("commit refs/heads/%s\nmark :%s\ncommitter Stub <stub@example.com> %s +0000\n"
+                "data %s\n%s\n%s" % (branch, mark, stamp, len(data), message, parent))
+
+    commands = []
+    for mark, pr in enumerate(merged, 1):
+        commands.append(commit(mark, pr['merged_at'], "%s (#%s)\n" % (pr['title'], pr['number']),
+                               "from :%s\n" % (mark - 1) if mark > 1 else ""))
+    marks_file = os.path.join(repo_dir, 'stub.marks')
+    fast_import(commands, marks_file)
+    with open(marks_file) as marks:
+        shas = dict(line.split() for line in marks)
+    for mark, pr in enumerate(merged, 1):
+        pr['merge_commit_sha'] = shas[':%s' % mark]
+
+    now = max([pr['merged_at'] for pr in merged] or [datetime.utcnow()])
+    reverted = [pr for pr in merged[::revert_every]]
+    commands = []
+    for mark, pr in enumerate(reverted, len(merged) + 1):
+        parent = "from refs/heads/%s^0\n" % branch if mark == len(merged) + 1 else ""
+        commands.append(commit(mark, now + timedelta(seconds=mark), 'Revert "%s"\n\nThis reverts commit %s.\n'
+                               % (pr['title'], pr['merge_commit_sha']), parent))
+    if commands:
+        fast_import(commands)
+    return set(pr['merge_commit_sha'] for pr in reverted)
+
+
+def parse_terms(terms):
+    """
+    Turn search terms into (field, low, high) checks: None bounds are open,
+    dates are parsed once per search rather than once per PR
+    """
+    checks = []
+    for term in terms:
+        key, _, value = term.partition(':')
+        if term == 'is:pr' or key == 'repo':
+            continue
+        if term == 'is:open':
+            checks.append(('state', 'open', None))
+        elif term == 'is:closed':
+            checks.append(('state', 'closed', None))
+        elif term == 'is:merged':
+            checks.append(('merged_at', None, None))
+        elif key == 'label':
+            checks.append(('label', value, None))
+        elif key == 'base':
+            checks.append(('base', value, None))
+        elif key in ('merged', 'created', 'updated'):
+            if '..' in value:
+                start, end = value.split('..')
+                checks.append((key + '_at', search_bound(start), search_bound(end, upper=True)))
+            elif value.startswith('>='):
+                checks.append((key + '_at', search_bound(value[2:]), None))
+            elif value.startswith('<='):
+                checks.append((key + '_at', None, search_bound(value[2:], upper=True)))
+    return checks
+
+
+class StubGithubServer:
+    """
+    Serves repo, commit, search, pull and label endpoints and GraphQL PR
+    searches and lookups for one repo from a dict of PRs (see
+    synthetic_prs()). Every request is counted by endpoint in `calls`, the
+    304s among them in `not_modified`. Each response is held back `latency`
+    seconds (+/- `jitter` of it) and charged to its token's `rate_limits`
+    bucket; an empty bucket answers 403 until its window resets.
+    rate_limits=None leaves the X-RateLimit-* headers out.
+    """
+
+    def __init__(self, prs, repo_name="apache/cloudstack", clone_url=None, port=0,
+                 latency=0.0, jitter=0.2, rate_limits=RATE_LIMITS):
+        self.prs = prs
+        self.repo_name = repo_name
+        self.clone_url = clone_url or "https://github.com/%s.git" % repo_name
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limits = rate_limits
+        self.budgets = {}
+        self.calls = {}
+        self.not_modified = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self.handler_class())
+        self.httpd.daemon_threads = True
+        self.url = "http://127.0.0.1:%s" % self.httpd.server_port
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def count(self, endpoint):
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+    def reset_calls(self):
+        with self.lock:
+            self.calls = {}
+            self.not_modified = 0
+
+    def charge(self, token, resource):
+        """
+        Take a request from a token's bucket, returns (whether the bucket
+        had room, the X-RateLimit-* headers to send)
+        """
+        limit, window = self.rate_limits[resource]
+        now = time.time()
+        with self.lock:
+            budget = self.budgets.get((token, resource))
+            if budget is None or budget['reset'] <= now:
+                budget = self.budgets[(token, resource)] = {'used': 0, 'reset': int(now + window)}
+            allowed = budget['used'] < limit
+            if allowed:
+                budget['used'] += 1
+            return allowed, self.rate_headers(budget, limit, resource)
+
+    def refund(self, token, resource):
+        """
+        Give back the request a 304 was charged, as Github doesn't count
+        them, returns the X-RateLimit-* headers to send instead
+        """
+        limit, window = self.rate_limits[resource]
+        with self.lock:
+            budget = self.budgets[(token, resource)]
+            budget['used'] = max(budget['used'] - 1, 0)
+            self.not_modified += 1
+            return self.rate_headers(budget, limit, resource)
+
+    def rate_headers(self, budget, limit, resource):
+        return {'X-RateLimit-Limit': str(limit),
+                'X-RateLimit-Remaining': str(limit - budget['used']),
+                'X-RateLimit-Reset': str(budget['reset']),
+                'X-RateLimit-Used': str(budget['used']),
+                'X-RateLimit-Resource': resource}
+
+    def handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            rate_headers = {}
+            charged = None
+
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+                if self.command == 'GET' and status == 200:
+                    etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                    headers = dict(headers or {}, ETag=etag)
+                    if self.headers.get('If-None-Match') == etag:
+                        status, body = 304, b''
+                        if self.charged:
+                            self.rate_headers = stub.refund(*self.charged)
+                        else:
+                            with stub.lock:
+                                stub.not_modified += 1
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in list(self.rate_headers.items()) + list((headers or {}).items()):
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def read_json(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'null') if length else None
+
+            def do_GET(self):
+                stub.route(self, 'GET')
+
+            def do_POST(self):
+                stub.route(self, 'POST')
+
+            def do_PATCH(self):
+                stub.route(self, 'PATCH')
+
+            def do_PUT(self):
+                stub.route(self, 'PUT')
+
+            def do_DELETE(self):
+                stub.route(self, 'DELETE')
+
+        return Handler
+
+    def route(self, handler, method):
+        parsed = urlparse(handler.path)
+        path = parsed.path.rstrip('/')
+        query = parse_qs(parsed.query)
+        repo_path = "/repos/%s" % self.repo_name
+
+        if self.latency:
+            time.sleep(self.latency * (1 + random.uniform(-self.jitter, self.jitter)))
+        handler.rate_headers = {}
+        handler.charged = None
+        if self.rate_limits:
+            resource = 'search' if path.startswith('/search/') else 'graphql' if path == '/graphql' else 'core'
+            handler.charged = (handler.headers.get('Authorization'), resource)
+            allowed, handler.rate_headers = self.charge(*handler.charged)
+            if not allowed:
+                self.count('rate_limited')
+                return handler.send_json(403, {'message': 'API rate limit exceeded'})
+
+        if method == 'GET' and path == "/search/issues":
+            self.count('search')
+            return self.search(handler, query)
+        if method == 'POST' and path == "/graphql":
+            self.count('graphql')
+            return self.graphql(handler)
+        if method == 'GET' and path == repo_path:
+            self.count('repo')
+            return handler.send_json(200, self.repo_json(handler))
+        match = re.match(re.escape(repo_path) + r"/commits/(\w+)$", path)
+        if method == 'GET' and match:
+            self.count('commit')
+            return handler.send_json(200, self.commit_json(match.group(1)))
+        match = re.match(re.escape(repo_path) + r"/(pulls|issues)/(\d+)$", path)
+        if match and int(match.group(2)) in self.prs:
+            pr = self.prs[int(match.group(2))]
+            if method == 'GET':
+                self.count(match.group(1))
+                if match.group(1) == 'pulls':
+                    return handler.send_json(200, self.pull_json(handler, pr))
+                return handler.send_json(200, self.issue_json(handler, pr))
+            if method == 'PATCH':
+                self.count('labels_write')
+                body = handler.read_json() or {}
+                if 'labels' in body:
+                    pr['labels'] = list(body['labels'])
+                return handler.send_json(200, self.issue_json(handler, pr))
+        match = re.match(re.escape(repo_path) + r"/issues/(\d+)/labels(?:/(.+))?$", path)
+        if match and int(match.group(1)) in self.prs:
+            pr = self.prs[int(match.group(1))]
+            self.count('labels_write')
+            if method in ('POST', 'PUT'):
+                body = handler.read_json()
+                names = body.get('labels', []) if isinstance(body, dict) else (body or [])
+                if method == 'PUT':
+                    pr['labels'] = []
+                for name in names:
+                    if name not in pr['labels']:
+                        pr['labels'].append(name)
+                return handler.send_json(200, [{'name': l} for l in pr['labels']])
+            if method == 'DELETE' and match.group(2):
+                name = unquote(match.group(2))
+                if name not in pr['labels']:
+                    return handler.send_json(404, {'message': 'Label does not exist'})
+                pr['labels'].remove(name)
+                return handler.send_json(200, [{'name': l} for l in pr['labels']])
+        self.count('not_found')
+        handler.send_json(404, {'message': 'Not Found'})
+
+    def repo_json(self, handler):
+        owner, name = self.repo_name.split('/')
+        return {'id': 1, 'name': name, 'full_name': self.repo_name,
+                'owner': {'login': owner}, 'url': self.url + "/repos/" + self.repo_name,
+                'clone_url': self.clone_url, 'git_url': self.clone_url, 'default_branch': 'main'}
+
+    def commit_json(self, sha):
+        # the previous release: a year before the newest PR
+        newest = max([pr['created_at'] for pr in self.prs.values()] or [datetime.utcnow()])
+        date = gh_date(newest - timedelta(days=365))
+        return {'sha': sha, 'url': self.url + "/repos/%s/commits/%s" % (self.repo_name, sha),
+                'commit': {'message': 'release', 'author': {'name': 'a', 'email': 'a@b', 'date': date},
+                           'committer': {'name': 'a', 'email': 'a@b', 'date': date}}}
+
+    def issue_json(self, handler, pr):
+        base = self.url + "/repos/%s" % self.repo_name
+        return {
+            'number': pr['number'], 'title': pr['title'], 'body': pr['body'], 'state': pr['state'],
+            'draft': pr['draft'], 'labels': [{'name': l} for l in pr['labels']],
+            'created_at': gh_date(pr['created_at']), 'updated_at': gh_date(pr['updated_at']),
+            'closed_at': gh_date(pr['merged_at']), 'url': base + "/issues/%s" % pr['number'],
+            'repository_url': base,
+            'pull_request': {'url': base + "/pulls/%s" % pr['number'], 'merged_at': gh_date(pr['merged_at'])},
+        }
+
+    def pull_json(self, handler, pr):
+        pull = self.issue_json(handler, pr)
+        pull.update({'url': self.url + "/repos/%s/pulls/%s" % (self.repo_name, pr['number']),
+                     'merged': pr['merged_at'] is not None, 'merged_at': gh_date(pr['merged_at']),
+                     'merge_commit_sha': pr['merge_commit_sha'], 'base': {'ref': pr.get('base') or 'master'}})
+        return pull
+
+    def pull_node(self, pr):
+        """
+        A PullRequest as the GraphQL API returns the fields graphql.PR_FIELDS asks for
+        """
+        return {'number': pr['number'], 'title': pr['title'], 'body': pr['body'], 'isDraft': pr['draft'],
+                'state': 'MERGED' if pr['merged_at'] else pr['state'].upper(),
+                'createdAt': gh_date(pr['created_at']), 'updatedAt': gh_date(pr['updated_at']),
+                'mergedAt': gh_date(pr['merged_at']),
+                'mergeCommit': {'oid': pr['merge_commit_sha']} if pr['merge_commit_sha'] else None,
+                'labels': {'nodes': [{'name': l} for l in pr['labels']]}}
+
+    def matches(self, pr, checks):
+        for field, low, high in checks:
+            if field == 'state':
+                if pr['state'] != low:
+                    return False
+            elif field == 'label':
+                if low not in pr['labels']:
+                    return False
+            elif field == 'base':
+                if pr.get('base') not in (None, low):
+                    return False
+            else:
+                value = pr[field]
+                if value is None or (low is not None and value < low) or (high is not None and value > high):
+                    return False
+        return True
+
+    def found(self, search_string):
+        """
+        The PRs a search string matches, newest first
+        """
+        checks = parse_terms(search_string.split())
+        return [pr for number, pr in sorted(self.prs.items(), reverse=True) if self.matches(pr, checks)]
+
+    def search(self, handler, query):
+        per_page = int(query.get('per_page', ['30'])[0])
+        page = int(query.get('page', ['1'])[0])
+        found = self.found(query.get('q', [''])[0])
+        # the real search API never returns more than 1000 results
+        visible = found[:1000]
+        items = visible[(page - 1) * per_page:page * per_page]
+        headers = {}
+        if page * per_page < len(visible):
+            next_url = "%s/search/issues?%s" % (self.url, urlencode(
+                {'q': query.get('q', [''])[0], 'per_page': per_page, 'page': page + 1}))
+            headers['Link'] = '<%s>; rel="next"' % next_url
+        handler.send_json(200, {'total_count': len(found), 'incomplete_results': False,
+                                'items': [self.issue_json(handler, pr) for pr in items]}, headers)
+
+    def graphql(self, handler):
+        """
+        Answer the two queries lib/graphql.py sends: a PR search paged by
+        cursor, and a batch of aliased repository.pullRequest(number:) lookups
+        """
+        request = handler.read_json() or {}
+        variables = request.get('variables') or {}
+        if 'search' in variables:
+            # the GraphQL search stops at 1000 results too
+            found = self.found(variables['search'])
+            visible = found[:1000]
+            start = int(variables.get('cursor') or 0)
+            nodes = visible[start:start + int(variables.get('page_size') or 100)]
+            end = start + len(nodes)
+            return handler.send_json(200, {'data': {'search': {
+                'issueCount': len(found), 'pageInfo': {'hasNextPage': end < len(visible), 'endCursor': str(end)},
+                'nodes': [self.pull_node(pr) for pr in nodes]}}})
+        aliases = re.findall(r'(\w+): pullRequest\(number: (\d+)\)', request.get('query') or '')
+        if aliases:
+            repository = {}
+            errors = []
+            for alias, number in aliases:
+                pr = self.prs.get(int(number))
+                repository[alias] = self.pull_node(pr) if pr else None
+                if pr is None:
+                    errors.append({'type': 'NOT_FOUND', 'path': ['repository', alias],
+                                   'message': "Could not resolve to a PullRequest with the number of %s." % number})
+            payload = {'data': {'repository': repository}}
+            if errors:
+                payload['errors'] = errors
+            return handler.send_json(200, payload)
+        handler.send_json(200, {'errors': [{'message': 'The stub only answers PR searches and lookups'}]})
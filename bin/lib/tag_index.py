@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+from datetime import datetime
+import pygit2
+from lib import git_mirror
+
+
+def commit_date(commit):
+    """
+    The author date in UTC, as the API's commit.author.date reports it
+    """
+    return datetime.utcfromtimestamp(commit.author.time).strftime('%Y-%m-%d')
+
+
+class TagIndex:
+    """
+    On-disk map of tag name -> commit SHA and of commit SHA -> author date,
+    filled from the tags in the git mirror and from API lookups for
+    anything the mirror doesn't have, so a release version or SHA is only
+    ever asked for once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tags = {}
+        self.dates = {}
+        if os.path.isfile(path):
+            try:
+                with open(path) as index_file:
+                    data = json.load(index_file)
+                self.tags = data['tags']
+                self.dates = data['dates']
+            except Exception as e:
+                print("- Ignoring unreadable tag index '%s': %s" % (path, str(e)))
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as index_file:
+            json.dump({'tags': self.tags, 'dates': self.dates}, index_file)
+        os.replace(tmp_path, self.path)
+
+    def update(self, mirror):
+        """
+        Add every tag in the mirror, annotated tags peeled to their commit
+        """
+        for ref_name in mirror.references:
+            if not ref_name.startswith('refs/tags/'):
+                continue
+            try:
+                commit = mirror.references[ref_name].peel(pygit2.Commit)
+            except (pygit2.GitError, ValueError, KeyError):
+                continue
+            sha = str(commit.id)
+            self.tags[ref_name[len('refs/tags/'):]] = sha
+            self.dates.setdefault(sha, commit_date(commit))
+
+    def resolve(self, repo, version):
+        """
+        The commit SHA tagged `version`, from the index or else from the API
+        """
+        if version not in self.tags:
+            ref = repo.get_git_ref("tags/" + version)
+            sha = ref.object.sha
+            if ref.object.type == 'tag':
+                sha = repo.get_git_tag(sha).object.sha
+            self.tags[version] = sha
+        return self.tags[version]
+
+    def date(self, repo, sha, mirror=None):
+        """
+        The author date ('%Y-%m-%d') of commit `sha`, from the index, the mirror or else the API
+        """
+        if sha not in self.dates:
+            if mirror is not None and sha in mirror:
+                self.dates[sha] = commit_date(mirror[sha].peel(pygit2.Commit))
+            else:
+                commit = repo.get_commit(sha=sha)
+                self.dates[sha] = str(commit.commit.author.date.date())
+        return self.dates[sha]
+
+
+def resolve_release(repo, mirror_dir, version=None, sha=None, mirror=None):
+    """
+    Return (SHA, author date) of the previous release given its version
+    or its SHA, served from the tag index kept next to the mirror
+    """
+    with git_mirror.mirror_lock(mirror_dir.rstrip('/') + ".tags"):
+        index = TagIndex(mirror_dir.rstrip('/') + ".tags.json")
+        if mirror is not None:
+            index.update(mirror)
+        if not sha:
+            print("Finding commit SHA for previous version " + version)
+            sha = index.resolve(repo, version)
+        date = index.date(repo, sha, mirror)
+        index.save()
+    return sha, date
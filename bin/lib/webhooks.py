@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Receives Github `pull_request` and `label` webhook events and applies
+them to a PRCollection, so a long running report can follow changes as
+they happen instead of searching for them. replay() posts recorded or
+hand written events to a receiver, signed like Github signs them.
+"""
+
+import hashlib
+import hmac
+import json
+import queue
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from lib import pulls
+
+SIGNATURE_HEADER = 'X-Hub-Signature-256'
+EVENT_HEADER = 'X-GitHub-Event'
+# larger payloads are refused before they are read
+MAX_PAYLOAD_BYTES = 25 * 1024 * 1024
+
+
+def sign(secret, body):
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret, body, signature):
+    """
+    Whether `signature` (the X-Hub-Signature-256 header) is the HMAC of `body` with `secret`
+    """
+    return bool(signature) and hmac.compare_digest(sign(secret, body), signature)
+
+
+def record_from_pull(pull):
+    """
+    A PRRecord from the `pull_request` object of an event
+    """
+    return pulls.freeze(pulls.record_from_pull(pull))
+
+
+def apply_event(collection, event, payload, base=None):
+    """
+    Apply one webhook event to `collection`, returns the numbers of the PRs it changed.
+    pull_request events replace the PR with the copy in the payload (PRs
+    closed without being merged, or with `base` not targeting that branch,
+    are dropped), label events rename or remove a repo label on every PR carrying it.
+    """
+    if event == 'pull_request' and 'pull_request' in payload:
+        pull = payload['pull_request']
+        if base and (pull.get('base') or {}).get('ref') != base:
+            # a PR retargeted away from `base` leaves the report
+            if collection.prs.pop(pull['number'], None) is None:
+                return set()
+            return {pull['number']}
+        record = record_from_pull(pull)
+        if record.state == 'closed' and record.merged_at is None:
+            collection.prs.pop(record.number, None)
+        else:
+            collection.add([record])
+        return {record.number}
+    if event == 'label' and payload.get('action') in ('edited', 'deleted'):
+        name = payload['label']['name']
+        old_name = payload.get('changes', {}).get('name', {}).get('from', name)
+        changed = set()
+        for pr in list(collection.prs.values()):
+            if old_name in pr.labels:
+                labels = set(pr.labels) - {old_name}
+                if payload['action'] == 'edited':
+                    labels.add(name)
+                collection.add([pulls.replace(pr, labels=labels)])
+                changed.add(pr.number)
+        return changed
+    return set()
+
+
+class WebhookReceiver:
+    """
+    A small HTTP endpoint for Github webhooks. Deliveries with a valid
+    signature are queued as (event, payload) for the main thread to apply
+    with next_events(), anything else is answered 401 and dropped.
+    """
+
+    def __init__(self, secret, port, host='0.0.0.0'):
+        self.secret = secret
+        self.events = queue.Queue()
+        self.stats = {'received': 0, 'rejected': 0}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class())
+        self.httpd.daemon_threads = True
+        self.url = "http://%s:%s/" % (host, self.httpd.server_port)
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print("- Listening for webhook events on port %s" % self.httpd.server_port)
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def next_events(self, timeout=None):
+        """
+        Wait up to `timeout` seconds for an event, then return it with every
+        other event already queued, so a burst is applied in one go
+        """
+        try:
+            events = [self.events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def handler_class(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def count(self, stat):
+                with receiver.lock:
+                    receiver.stats[stat] += 1
+
+            def reply(self, status, text):
+                body = text.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/plain')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > MAX_PAYLOAD_BYTES:
+                    self.count('rejected')
+                    return self.reply(413, "payload too large\n")
+                body = self.rfile.read(length)
+                if not verify_signature(receiver.secret, body, self.headers.get(SIGNATURE_HEADER)):
+                    self.count('rejected')
+                    return self.reply(401, "bad signature\n")
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    self.count('rejected')
+                    return self.reply(400, "payload is not JSON\n")
+                self.count('received')
+                receiver.events.put((self.headers.get(EVENT_HEADER), payload))
+                self.reply(202, "queued\n")
+
+        return Handler
+
+
+def load_events(path):
+    """
+    Read events to replay from a JSON lines file of {"event": ..., "payload": ...} objects
+    """
+    with open(path) as events_file:
+        return [json.loads(line) for line in events_file if line.strip()]
+
+
+def replay(url, secret, events):
+    """
+    POST each {"event", "payload"} to a receiver signed with `secret`, as
+    Github delivers them. Returns the HTTP status of each delivery.
+    """
+    statuses = []
+    for number, event in enumerate(events):
+        body = json.dumps(event['payload']).encode('utf-8')
+        request = urllib.request.Request(url, data=body, method='POST', headers={
+            'Content-Type': 'application/json', EVENT_HEADER: event['event'],
+            'X-GitHub-Delivery': 'replay-%s' % number, SIGNATURE_HEADER: sign(secret, body)})
+        try:
+            with urllib.request.urlopen(request) as response:
+                statuses.append(response.status)
+        except urllib.error.HTTPError as e:
+            statuses.append(e.code)
+    return statuses
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+def ordered_map(func, items, workers=1):
+    """
+    map() `func` over `items` on a pool of `workers` threads.
+    Results come back in input order, so output matches a sequential run.
+    """
+    if workers <= 1:
+        yield from map(func, items)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(func, items)
+
+
+def apply_result(result, tables, counts, label_changes=None, log=True):
+    """
+    Apply the outcome of classifying one PR on the main thread:
+    print its log lines, add its table rows, bump its counters and
+    queue its label changes
+    """
+    if log:
+        for line in result['log']:
+            print(line)
+    for table_name, row in result['rows']:
+        tables[table_name].add_row(row)
+    for counter in result['counts']:
+        counts[counter] += 1
+    if label_changes is not None:
+        label_changes.extend(result['labels'])
+
+
+def new_result():
+    return {'log': [], 'rows': [], 'counts': [], 'labels': []}
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Usage:
+  replay_webhooks.py --events=<file> --secret=<arg> [--url=<arg>]
+  replay_webhooks.py (-h | --help)
+
+Posts webhook events to a running acs_report_prs.py (started with
+"--webhook_port") signed with its secret, the way Github delivers them,
+so event handling can be tried without Github.
+
+Options:
+  -h --help                 Show this screen.
+  --events=<file>           JSON lines file, one {"event": "pull_request", "payload": {...}} per line.
+                              Payloads are the bodies Github sends, as shown under a webhook's
+                              "Recent Deliveries".
+  --secret=<arg>            The --webhook_secret the receiver was started with.
+  --url=<arg>               Where the receiver listens [default: http://127.0.0.1:8080/].
+
+requires: python3.8 + docopt
+"""
+
+import docopt
+import sys
+from lib import webhooks
+
+
+if __name__ == '__main__':
+    args = docopt.docopt(__doc__)
+    events = webhooks.load_events(args['--events'])
+    statuses = webhooks.replay(args['--url'], args['--secret'], events)
+    for event, status in zip(events, statuses):
+        payload = event['payload']
+        number = (payload.get('pull_request') or {}).get('number', '-')
+        print("%s %s #%s: HTTP %s" % (event['event'], payload.get('action', ''), number, status))
+    print("\n%s of %s events accepted" % (statuses.count(202), len(statuses)))
+    sys.exit(0 if statuses.count(202) == len(statuses) else 1)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+The single pass checkbox parser against the per-label regex scan it replaced.
+"""
+
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import checkboxes  # noqa: E402
+
+
+def regex_scan_labels(label_texts, body):
+    """
+    The original per-label scan
+    """
+    return set(label for label, text in label_texts.items()
+               if re.search('.*- \\[ ?x ?\\] ' + text + ' .*', str(body), re.I))
+
+
+def synthetic_body(rng, label_texts, size):
+    """
+    A PR description of roughly `size` characters: prose and log lines
+    around a type template with zero, one or two boxes ticked
+    """
+    texts = list(label_texts.values())
+    ticked = rng.sample(texts, rng.choice([0, 1, 1, 1, 2]))
+    template = ["### Types of changes", ""]
+    for text in texts:
+        box = rng.choice(['x', 'X', ' x', 'x ']) if text in ticked else ' '
+        template.append("- [%s] %s (%s)" % (box, text, "a template hint"))
+    filler = []
+    while sum(len(line) + 1 for line in filler) < size:
+        filler.append(' '.join(rng.choice(['the', 'vm', 'host', 'fix', '[x]', '- [', 'Bug',
+                                           'failed', 'volume', 'network', '2024-01-01'])
+                               for i in range(rng.randint(5, 40))))
+    middle = rng.randint(0, len(filler))
+    return '\n'.join(filler[:middle] + template + filler[middle:])
+
+
+class CheckboxParserTest(unittest.TestCase):
+
+    def test_same_labels_as_the_per_label_scan(self):
+        rng = random.Random(0)
+        bodies = [synthetic_body(rng, checkboxes.TYPE_CHECKBOXES, 5000) for i in range(200)] + [None, '']
+        for body in bodies:
+            self.assertEqual(checkboxes.type_parser.ticked(body),
+                             regex_scan_labels(checkboxes.TYPE_CHECKBOXES, body))
+
+    def test_edge_cases(self):
+        bodies = ["- [x] Bug fix (a fix)", "- [ X ] bug FIX ", "- [x] Bug fix", "- [x]  Bug fix ",
+                  "* [x] Bug fix ", "- [x] New feature (and) - [x] Experimental feature (x)",
+                  "- [x] Cleanup \n- [x] Breaking change \n- [ ] Enhancement "]
+        for body in bodies:
+            self.assertEqual(checkboxes.type_parser.ticked(body),
+                             regex_scan_labels(checkboxes.TYPE_CHECKBOXES, body), body)
+        self.assertEqual(checkboxes.type_parser.ticked(bodies[-1]), {"type:cleanup", "type:breaking_change"})
+
+
+if __name__ == '__main__':
+    unittest.main()
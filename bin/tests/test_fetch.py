@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+The fetch backends run against the stub Github API.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import fetch  # noqa: E402
+from lib import gh_client  # noqa: E402
+from lib import stub_server  # noqa: E402
+
+BACKENDS = fetch.BACKENDS
+
+
+def fetched(records):
+    return dict((record.number, (record.labels, record.state, record.ticked, record.merge_commit_sha))
+                for record in records)
+
+
+class BackendTest(unittest.TestCase):
+
+    rate_limits = None
+    size = 1500
+
+    @classmethod
+    def setUpClass(cls):
+        cls.prs = stub_server.synthetic_prs(cls.size)
+        cls.stub = stub_server.StubGithubServer(cls.prs, rate_limits=cls.rate_limits).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.stop()
+
+    def github(self):
+        gh = gh_client.get_github("stub-token", use_cache=False, gh_api_url=self.stub.url)
+        return gh, gh.get_repo(self.stub.repo_name)
+
+    def search(self, search_string, required, backend):
+        gh, repo = self.github()
+        return fetched(fetch.search_prs(gh, repo, search_string, required, backend, "stub-token"))
+
+
+class BackendsAgreeTest(BackendTest):
+
+    def test_sharded_search(self):
+        # over the 1000 result cap, so every backend fetches it in date range shards
+        search_string = "repo:%s is:pr" % self.stub.repo_name
+        # only graphql has the merge commit without asking for pull details
+        results = [dict((number, fields[:3]) for number, fields in self.search(search_string, (), backend).items())
+                   for backend in BACKENDS]
+        self.assertEqual(set(results[0]), set(self.prs))
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
+        for number, (labels, state, ticked) in results[0].items():
+            self.assertEqual(labels, frozenset(self.prs[number]['labels']))
+
+    def test_search_with_pull_details(self):
+        since = max(pr['created_at'] for pr in self.prs.values()) - timedelta(days=120)
+        search_string = "repo:%s is:pr is:closed created:>=%s" % (self.stub.repo_name, since.strftime('%Y-%m-%d'))
+        results = [self.search(search_string, ('merge_commit_sha',), backend) for backend in BACKENDS]
+        self.assertTrue(results[0])
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
+        for number, (labels, state, ticked, sha) in results[0].items():
+            self.assertEqual(sha, self.prs[number]['merge_commit_sha'])
+
+    def test_records_by_number(self):
+        numbers = list(range(1, 60)) + [self.size + 1]
+        results = []
+        for backend in BACKENDS:
+            gh, repo = self.github()
+            results.append(fetched(fetch.get_pr_records(repo, numbers, backend, "stub-token")))
+        self.assertEqual(set(results[0]), set(range(1, 60)))
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
+
+
+class BaseFilterTest(BackendTest):
+
+    size = 300
+
+    @classmethod
+    def setUpClass(cls):
+        cls.prs = stub_server.synthetic_prs(cls.size, bases=('master', '4.19'))
+        cls.stub = stub_server.StubGithubServer(cls.prs).start()
+
+    def test_base_qualifier(self):
+        search_string = "repo:%s is:pr base:4.19" % self.stub.repo_name
+        expected = set(number for number, pr in self.prs.items() if pr['base'] == '4.19')
+        self.assertTrue(0 < len(expected) < self.size)
+        for backend in BACKENDS:
+            self.assertEqual(set(self.search(search_string, (), backend)), expected)
+
+
+class ConditionalRequestTest(BackendTest):
+
+    rate_limits = {'core': (5000, 3600), 'search': (30, 60)}
+    size = 10
+
+    def tearDown(self):
+        gh_client.TrawlerConnectionMixin.cache = None
+
+    def test_unchanged_pull_is_answered_from_the_cache(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        for _ in range(2):
+            gh = gh_client.get_github("stub-token", tmp_dir, gh_api_url=self.stub.url)
+            self.assertEqual(gh.get_repo(self.stub.repo_name).get_pull(3).title, self.prs[3]['title'])
+            gh_client.TrawlerConnectionMixin.cache.save()
+        self.assertEqual(self.stub.not_modified, 2)
+        # the repo and the pull were charged once, their 304s were free
+        self.assertEqual(self.stub.budgets[("token stub-token", 'core')]['used'], 2)
+
+
+class AsyncRateLimitTest(BackendTest):
+
+    # 5 search pages against a budget of 4 searches every 5 seconds
+    rate_limits = {'core': (5000, 3600), 'search': (4, 5)}
+    size = 450
+
+    def test_async_search_waits_for_the_budget(self):
+        self.stub.reset_calls()
+        results = self.search("repo:%s is:pr" % self.stub.repo_name, (), 'async')
+        self.assertEqual(set(results), set(self.prs))
+        self.assertEqual(self.stub.calls.get('search'), 5)
+        self.assertNotIn('rate_limited', self.stub.calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+The conditional request (ETag) cache: what it is keyed on, what it
+skips, how it evicts, and that the connection never shares entries
+between tokens.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import gh_client  # noqa: E402
+from lib import http_cache  # noqa: E402
+
+ETAG_HEADERS = {'ETag': '"v1"'}
+
+
+class CacheKeyTest(unittest.TestCase):
+
+    def key(self, **headers):
+        return http_cache.cache_key("api.github.com", 443, "/repos/a/b/pulls/1", headers)
+
+    def test_token_is_part_of_the_key(self):
+        self.assertNotEqual(self.key(Authorization="token one"), self.key(Authorization="token two"))
+        self.assertNotEqual(self.key(Authorization="token one"), self.key())
+        self.assertEqual(self.key(Authorization="token one"), self.key(authorization="token one"))
+
+    def test_token_is_never_stored_as_is(self):
+        self.assertNotIn("secret-token", self.key(Authorization="token secret-token"))
+
+    def test_media_type_is_part_of_the_key(self):
+        self.assertNotEqual(self.key(Accept="application/vnd.github.v3+json"),
+                            self.key(Accept="application/vnd.github.v3.diff"))
+        self.assertEqual(self.key(Accept="application/json"), self.key(accept="application/json"))
+
+    def test_url_is_part_of_the_key(self):
+        self.assertNotEqual(http_cache.cache_key("api.github.com", 443, "/repos/a/b/pulls/1", {}),
+                            http_cache.cache_key("api.github.com", 443, "/repos/a/b/pulls/2", {}))
+
+
+class CacheableTest(unittest.TestCase):
+
+    def test_updated_searches_are_skipped(self):
+        self.assertFalse(http_cache.cacheable(
+            "/search/issues?q=repo%3Aa%2Fb+is%3Apr+updated%3A%3E%3D2026-10-01T10%3A00%3A00Z&per_page=100"))
+        self.assertFalse(http_cache.cacheable("/search/issues?q=repo:a/b is:pr updated:>=2026-10-01"))
+
+    def test_other_requests_are_cached(self):
+        self.assertTrue(http_cache.cacheable("/search/issues?q=repo%3Aa%2Fb+is%3Apr+merged%3A%3E%3D2026-01-01"))
+        self.assertTrue(http_cache.cacheable("/repos/a/b/pulls/1"))
+        self.assertTrue(http_cache.cacheable("/repos/a/b/issues?labels=updated"))
+
+
+class EvictionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, http_cache.CACHE_FILE_NAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_default_size(self):
+        self.assertEqual(http_cache.HttpCache(self.path).max_bytes, 64 * 1024 * 1024)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = http_cache.HttpCache(self.path, max_bytes=30)
+        for key in ("a", "b", "c"):
+            cache.store(key, ETAG_HEADERS, "x" * 10)
+        self.assertIsNotNone(cache.hit("a"))
+        cache.store("d", ETAG_HEADERS, "x" * 10)
+        self.assertEqual(list(cache.entries), ["c", "a", "d"])
+        self.assertEqual((cache.size, cache.evictions), (30, 1))
+        self.assertEqual(cache.validators("b"), {})
+        self.assertEqual(cache.validators("a"), {'If-None-Match': '"v1"'})
+
+    def test_size_is_counted_in_encoded_bytes(self):
+        cache = http_cache.HttpCache(self.path, max_bytes=30)
+        # 10 characters, 20 bytes
+        cache.store("a", ETAG_HEADERS, "é" * 10)
+        self.assertEqual(cache.size, 20)
+        cache.store("b", ETAG_HEADERS, "é" * 10)
+        self.assertEqual(list(cache.entries), ["b"])
+        cache.store("c", ETAG_HEADERS, "é" * 16)
+        self.assertEqual(list(cache.entries), ["b"])
+
+    def test_only_responses_with_a_validator_are_kept(self):
+        cache = http_cache.HttpCache(self.path)
+        cache.store("a", {'Content-Type': 'application/json'}, "{}")
+        cache.store("b", {'last-modified': 'Wed, 01 Oct 2026 10:00:00 GMT'}, "{}")
+        self.assertEqual(list(cache.entries), ["b"])
+        self.assertEqual(cache.validators("b"), {'If-Modified-Since': 'Wed, 01 Oct 2026 10:00:00 GMT'})
+        self.assertEqual(cache.misses, 2)
+
+    def test_saved_cache_keeps_its_order_and_size(self):
+        cache = http_cache.HttpCache(self.path, max_bytes=100)
+        for key in ("a", "b", "c"):
+            cache.store(key, ETAG_HEADERS, "é" * 10)
+        cache.hit("a")
+        cache.save()
+        loaded = http_cache.HttpCache(self.path, max_bytes=100)
+        self.assertEqual(list(loaded.entries), ["b", "c", "a"])
+        self.assertEqual(loaded.size, 60)
+
+
+class ConnectionTest(unittest.TestCase):
+    """
+    Requests made through PyGithub with the trawler connection classes
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.requests = []
+        test = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                test.requests.append((self.headers.get('Authorization'), self.headers.get('If-None-Match')))
+                if self.headers.get('If-None-Match') == '"v1"':
+                    self.send_response(304)
+                    self.send_header('ETag', '"v1"')
+                    self.end_headers()
+                    return
+                body = json.dumps({'login': 'someone', 'id': 1}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('ETag', '"v1"')
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%s" % self.httpd.server_port
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        gh_client.TrawlerConnectionMixin.cache = None
+        shutil.rmtree(self.tmp_dir)
+
+    def get_user(self, gh_token):
+        gh = gh_client.get_github(gh_token, self.tmp_dir, gh_api_url=self.url)
+        self.assertEqual(gh.get_user("someone").id, 1)
+        gh_client.TrawlerConnectionMixin.cache.save()
+
+    def test_entries_are_not_shared_between_tokens(self):
+        self.get_user("token-one")
+        self.get_user("token-one")
+        self.get_user("token-two")
+        self.get_user("token-two")
+        self.assertEqual(self.requests, [("token token-one", None), ("token token-one", '"v1"'),
+                                         ("token token-two", None), ("token token-two", '"v1"')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Run metrics and their Prometheus text.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import metrics  # noqa: E402
+
+
+class CacheMetricsTest(unittest.TestCase):
+
+    def test_only_cacheable_gets_count_as_misses(self):
+        recorder = metrics.RunMetrics()
+        recorder.record_request('GET', '/repos/a/b/pulls/1', 200, 10, cache_miss=True)
+        recorder.record_request('GET', '/repos/a/b/pulls/2', 304, 0, cached=True)
+        recorder.record_request('GET', '/search/issues?q=updated%3A%3E%3D2026-01-01', 200, 10)
+        recorder.record_request('POST', '/graphql', 200, 10)
+        recorder.record_request('PUT', '/repos/a/b/issues/1/labels', 200, 10)
+        summary = recorder.summary('test')
+        self.assertEqual(summary['requests_total'], 5)
+        self.assertEqual(summary['http_cache'], {'hits': 1, 'misses': 1})
+        lines = metrics.prometheus_lines(summary)
+        self.assertIn('trawler_http_cache_hits{script="test"} 1', lines)
+        self.assertIn('trawler_http_cache_misses{script="test"} 1', lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
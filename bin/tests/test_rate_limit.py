@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Rate limit pacing, run on a fake clock.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import rate_limit  # noqa: E402
+
+START = 1800000000.0
+
+
+class FakeClock:
+    """
+    time.time and time.sleep for a scheduler: sleeping moves the clock on and is recorded
+    """
+
+    def __init__(self, now=START):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def rate_headers(remaining, reset, limit=100, resource=None):
+    headers = {'X-RateLimit-Limit': str(limit), 'X-RateLimit-Remaining': str(remaining),
+               'X-RateLimit-Reset': str(int(reset))}
+    if resource:
+        headers['X-RateLimit-Resource'] = resource
+    return headers
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def scheduler(self, tokens=("tok1",)):
+        self.clock = FakeClock()
+        return rate_limit.RateLimitScheduler(tokens, clock=self.clock.time, sleep=self.clock.sleep)
+
+    def test_unknown_budget_is_not_paced(self):
+        # a server that never reports its budget (rate limiting off) gets no pacing
+        scheduler = self.scheduler()
+        for _ in range(rate_limit.DEFAULT_LIMITS['search'] * 3):
+            scheduler.acquire('search')
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(scheduler.consumption()['search']['used'], rate_limit.DEFAULT_LIMITS['search'] * 3)
+
+    def test_update_records_the_reported_budget(self):
+        scheduler = self.scheduler()
+        scheduler.update("tok1", 'core', rate_headers(42, START + 600, limit=60, resource='search'))
+        # the bucket Github names wins over the one guessed from the path
+        self.assertEqual(scheduler.budgets[("tok1", 'search')],
+                         {'limit': 60, 'remaining': 42, 'reset': int(START + 600)})
+        self.assertEqual(scheduler.budgets[("tok1", 'core')]['reset'], 0)
+        scheduler.update("tok1", 'core', {'Content-Type': 'application/json'})
+        self.assertEqual(scheduler.budgets[("tok1", 'core')]['reset'], 0)
+
+    def test_plenty_left_is_not_paced(self):
+        scheduler = self.scheduler()
+        scheduler.update("tok1", 'core', rate_headers(50, START + 100))
+        for _ in range(40):
+            scheduler.acquire('core')
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(scheduler.budgets[("tok1", 'core')]['remaining'], 10)
+
+    def test_reserve_is_spread_until_the_reset(self):
+        scheduler = self.scheduler()
+        reserve = int(100 * rate_limit.RESERVE_FRACTION)
+        scheduler.update("tok1", 'core', rate_headers(reserve - 5, START + 50))
+        scheduler.acquire('core')
+        # 4 left over the 50s to the reset: one request every 12.5s
+        scheduler.acquire('core')
+        self.assertEqual(self.clock.sleeps, [12.5])
+        scheduler.acquire('core')
+        self.assertEqual(self.clock.sleeps, [12.5, 12.5])
+
+    def test_spent_budget_waits_for_the_reset(self):
+        scheduler = self.scheduler()
+        scheduler.update("tok1", 'search', rate_headers(0, START + 30, limit=30))
+        scheduler.acquire('search')
+        self.assertEqual(self.clock.sleeps, [30])
+        # the window reset, the budget is whole again
+        self.assertEqual(scheduler.budgets[("tok1", 'search')], {'limit': 30, 'remaining': 30, 'reset': 0})
+
+    def test_spent_budget_with_a_past_reset_waits_a_second(self):
+        scheduler = self.scheduler()
+        scheduler.update("tok1", 'search', rate_headers(0, START + 1, limit=30))
+        self.clock.now = START + 0.75
+        scheduler.acquire('search')
+        self.assertEqual(self.clock.sleeps, [1])
+
+    def test_token_with_most_budget_left_is_used(self):
+        scheduler = self.scheduler(("tok1", "tok2"))
+        scheduler.update("tok1", 'core', rate_headers(48, START + 100))
+        scheduler.update("tok2", 'core', rate_headers(50, START + 100))
+        tokens = [scheduler.acquire('core') for _ in range(4)]
+        self.assertEqual(tokens, ["tok2", "tok2", "tok1", "tok2"])
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_backoff(self):
+        scheduler = self.scheduler()
+        self.assertIsNone(scheduler.backoff("tok1", 'core', 200, {}, "", 0))
+        self.assertIsNone(scheduler.backoff("tok1", 'core', 403, {}, "Resource not accessible", 0))
+        self.assertEqual(scheduler.backoff("tok1", 'core', 429, {'Retry-After': '7'}, "", 0), 7)
+        body = '{"message": "You have exceeded a secondary rate limit"}'
+        self.assertEqual(scheduler.backoff("tok1", 'core', 403, {}, body, 0), rate_limit.SECONDARY_BACKOFF)
+        self.assertEqual(scheduler.backoff("tok1", 'core', 403, {}, body, 2), rate_limit.SECONDARY_BACKOFF * 4)
+        self.assertEqual(scheduler.backoff("tok1", 'core', 403, rate_headers(0, START + 90), "", 0), 90)
+        self.assertEqual(scheduler.backoff("tok1", 'core', 403, rate_headers(0, START - 5), "", 0), 1)
+        self.assertEqual(scheduler.backoff("tok1", 'core', 403, {'X-RateLimit-Remaining': '0'}, "", 0),
+                         rate_limit.SECONDARY_BACKOFF)
+        self.assertEqual(scheduler.backoffs, 6)
+
+    def test_spent_token_is_retried_at_once_when_another_has_budget(self):
+        scheduler = self.scheduler(("tok1", "tok2"))
+        self.assertEqual(scheduler.backoff("tok1", 'core', 403, rate_headers(0, START + 90), "", 0), 0)
+
+
+class SharedSchedulerTest(unittest.TestCase):
+
+    def test_budget_is_shared_through_the_server(self):
+        served, address, authkey = rate_limit.serve_shared(["tok1", "tok2"])
+        first = rate_limit.connect_shared(address, authkey)
+        second = rate_limit.connect_shared(address, authkey)
+        self.assertEqual(first.tokens, ["tok1", "tok2"])
+        first.update("tok1", 'core', rate_headers(50, START + 100))
+        first.update("tok2", 'core', rate_headers(40, START + 100))
+        self.assertEqual(second.acquire('core'), "tok1")
+        self.assertEqual(served.budgets[("tok1", 'core')]['remaining'], 49)
+        self.assertEqual(second.backoff("tok1", 'core', 429, {'Retry-After': '3'}, b"", 0), 3)
+        self.assertEqual(first.consumption()['core']['used'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
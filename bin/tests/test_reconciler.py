@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+The label reconciler run end to end against the stub Github API.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+BIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BIN_DIR)
+
+from lib import stub_server  # noqa: E402
+
+
+class UpdateLabelsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.stub = stub_server.StubGithubServer(stub_server.synthetic_prs(20), rate_limits=None).start()
+
+    def tearDown(self):
+        self.stub.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def reconcile(self, update_labels):
+        config_file = os.path.join(self.tmp_dir, "conf.json")
+        with open(config_file, "w") as conf:
+            json.dump({"--gh_token": "stub-token", "--prev_release_commit_sha": "0" * 40,
+                       "--repo": self.stub.repo_name, "--branch": "master", "--gh_api_url": self.stub.url,
+                       "--tmp_dir": self.tmp_dir, "--update_labels": update_labels}, conf)
+        self.stub.reset_calls()
+        result = subprocess.run([sys.executable, os.path.join(BIN_DIR, "acs_github_label_reconciler.py"),
+                                 "--config=" + config_file], cwd=self.tmp_dir,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self.assertEqual(result.returncode, 0, result.stdout.decode('utf-8', 'replace'))
+        return self.stub.calls.get('labels_write', 0)
+
+    def test_false_string_writes_nothing(self):
+        self.assertEqual(self.reconcile("False"), 0)
+        self.assertEqual(self.reconcile("false"), 0)
+
+    def test_true_string_writes_the_plan(self):
+        self.assertGreater(self.reconcile("True"), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Report table ordering.
+"""
+
+import os
+import sys
+import unittest
+
+from prettytable import PrettyTable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import render  # noqa: E402
+
+
+class SortedRowsTest(unittest.TestCase):
+
+    rows = [["300", "C", "Bug Fix", "Major", "03"], ["1000", "A", "Bug Fix", "Major", "03"],
+            ["20", "B", "Bug Fix", "Major", "03"], ["5", "D", "Bug Fix", "BLOCKER", "01"]]
+
+    def test_ties_are_ordered_on_the_whole_row(self):
+        table = render.Table(["PR Number", "Title", "Type", "Severity", "_index"], "_index", ("_index",))
+        for row in self.rows:
+            table.add_row(row)
+        self.assertEqual([row[0] for row in table.sorted_rows()], ["5", "1000", "20", "300"])
+
+    def test_order_matches_prettytable(self):
+        table = render.Table(["PR Number", "Title", "Type", "Severity", "_index"], "_index", ("_index",))
+        pretty = PrettyTable(["PR Number", "Title", "Type", "Severity", "_index"])
+        for row in self.rows:
+            table.add_row(row)
+            pretty.add_row(row)
+        lines = pretty.get_string(sortby="_index", fields=["PR Number"], header=False, border=False).splitlines()
+        self.assertEqual([row[0] for row in table.sorted_rows()], [line.strip() for line in lines])
+
+
+if __name__ == '__main__':
+    unittest.main()
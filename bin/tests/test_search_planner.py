@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Splitting searches over the 1000 result cap into date range shards.
+"""
+
+import os
+import re
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import search_planner  # noqa: E402
+
+NOW = datetime(2026, 10, 1, 12, 0, 0)
+shard_range = re.compile(r'^(.*) (\w+):(\S+)\.\.(\S+)$')
+
+
+def parse_shard(query):
+    """
+    (query without its range, field, start, end) of a shard query
+    """
+    match = shard_range.match(query)
+    return (match.group(1), match.group(2), search_planner.parse_bound(match.group(3)),
+            search_planner.parse_bound(match.group(4)))
+
+
+class FakeSearch:
+    """
+    Counts the results of a shard query over a list of timestamps, as the search API would
+    """
+
+    def __init__(self, timestamps):
+        self.timestamps = timestamps
+        self.queries = []
+
+    def count(self, query):
+        self.queries.append(query)
+        base, field, start, end = parse_shard(query)
+        return len([stamp for stamp in self.timestamps if start <= stamp <= end])
+
+
+class PlanShardsTest(unittest.TestCase):
+
+    def assert_partition(self, search, shards, start, allow_over_cap=False):
+        """
+        Shards are in order without overlaps and between them hold every
+        result from `start` on, so whatever lies between two shards is empty
+        """
+        previous_end = start - timedelta(seconds=1)
+        for query, count in shards:
+            base, field, shard_start, shard_end = parse_shard(query)
+            if not allow_over_cap:
+                self.assertLessEqual(count, search_planner.SEARCH_CAP)
+            self.assertGreater(count, 0)
+            self.assertGreater(shard_start, previous_end)
+            self.assertLessEqual(shard_end, NOW)
+            previous_end = shard_end
+        self.assertEqual(sum(count for query, count in shards),
+                         len([stamp for stamp in search.timestamps if stamp >= start]))
+
+    def test_shards_fit_the_cap_and_cover_the_range(self):
+        start = datetime(2023, 1, 1)
+        # 5000 results bunched towards the end, so ranges are halved to different depths
+        timestamps = [NOW - timedelta(seconds=int((5000 - i) ** 2 * 3.7)) for i in range(5000)]
+        search = FakeSearch(timestamps)
+        shards = search_planner.plan_shards("repo:apache/cloudstack is:pr merged:>=2023-01-01", search.count, NOW)
+        self.assertGreater(len(shards), 5)
+        for query, count in shards:
+            base, field, shard_start, shard_end = parse_shard(query)
+            self.assertEqual((base, field), ("repo:apache/cloudstack is:pr", "merged"))
+        self.assert_partition(search, shards, start)
+
+    def test_search_without_date_qualifier_starts_at_the_earliest_date(self):
+        search = FakeSearch([NOW - timedelta(hours=i) for i in range(2500)])
+        shards = search_planner.plan_shards("repo:apache/cloudstack is:pr is:open", search.count, NOW)
+        self.assertEqual(parse_shard(search.queries[0])[1:], ('created', search_planner.EARLIEST, NOW))
+        self.assert_partition(search, shards, search_planner.EARLIEST)
+
+    def test_empty_window_has_no_shards(self):
+        search = FakeSearch([])
+        self.assertEqual(search_planner.plan_shards("repo:a/b is:pr updated:>=2026-09-30T00:00:00Z",
+                                                    search.count, NOW), [])
+        self.assertEqual(len(search.queries), 1)
+
+    def test_smallest_shard_over_the_cap_is_kept(self):
+        # 1500 results in the same second can't be split, the shard is kept with its count
+        burst = datetime(2026, 5, 5, 5, 5, 5)
+        search = FakeSearch([burst] * 1500 + [NOW - timedelta(days=i) for i in range(10)])
+        shards = search_planner.plan_shards("repo:a/b is:pr created:>=2026-01-01", search.count, NOW)
+        over = [(query, count) for query, count in shards if count > search_planner.SEARCH_CAP]
+        self.assertEqual(len(over), 1)
+        base, field, shard_start, shard_end = parse_shard(over[0][0])
+        self.assertLessEqual(shard_end - shard_start, search_planner.SMALLEST_SHARD)
+        self.assertTrue(shard_start <= burst <= shard_end)
+        self.assertEqual(over[0][1], 1500)
+        self.assert_partition(search, shards, datetime(2026, 1, 1), allow_over_cap=True)
+
+    def test_bounds_are_formatted_as_utc_seconds(self):
+        self.assertEqual(search_planner.shard_query("repo:a/b", "merged", datetime(2026, 1, 2),
+                                                    datetime(2026, 1, 2, 3, 4, 5)),
+                         "repo:a/b merged:2026-01-02T00:00:00+00:00..2026-01-02T03:04:05+00:00")
+        self.assertEqual(search_planner.split_query("repo:a/b updated:>=2026-01-02T03:04:05Z is:pr"),
+                         ("repo:a/b is:pr", "updated", datetime(2026, 1, 2, 3, 4, 5)))
+        self.assertEqual(search_planner.parse_bound("2026-01-02T03:04:05+00:00"), datetime(2026, 1, 2, 3, 4, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
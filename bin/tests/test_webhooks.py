@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Webhook events replayed to a WebhookReceiver, and applied to the report
+the way a long running acs_report_prs.py applies them.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import acs_report_prs  # noqa: E402
+from lib import pr_collection  # noqa: E402
+from lib import report_state  # noqa: E402
+from lib import webhooks  # noqa: E402
+
+SECRET = "webhook-secret"
+
+
+def pull(number, title, labels, state='open', merged_at=None):
+    return {'number': number, 'title': title, 'labels': [{'name': label} for label in labels], 'body': '',
+            'draft': False, 'state': state, 'created_at': '2026-09-01T10:00:00Z',
+            'updated_at': '2026-10-01T10:00:00Z', 'merged_at': merged_at,
+            'merge_commit_sha': "%040x" % number if merged_at else None, 'base': {'ref': 'main'}}
+
+
+def event(action, pull_request):
+    return {'event': 'pull_request', 'payload': {'action': action, 'pull_request': pull_request}}
+
+
+class ReceiverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.receiver = webhooks.WebhookReceiver(SECRET, 0, host='127.0.0.1').start()
+
+    def tearDown(self):
+        self.receiver.stop()
+
+    def test_signed_events_are_queued(self):
+        events = [event('opened', pull(1, "A PR", []))]
+        self.assertEqual(webhooks.replay(self.receiver.url, SECRET, events), [202])
+        self.assertEqual(self.receiver.next_events(timeout=5), [('pull_request', events[0]['payload'])])
+
+    def test_badly_signed_events_are_refused(self):
+        events = [event('opened', pull(1, "A PR", []))]
+        self.assertEqual(webhooks.replay(self.receiver.url, "not-the-secret", events), [401])
+        self.assertEqual(self.receiver.next_events(timeout=0.1), [])
+        self.assertEqual(self.receiver.stats, {'received': 0, 'rejected': 1})
+
+
+class ApplyEventsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.receiver = webhooks.WebhookReceiver(SECRET, 0, host='127.0.0.1').start()
+        # the state acs_report_prs.py keeps between watch cycles
+        for name, value in {'required_tables': ['wip_features', 'merged_fixes', 'merged_features',
+                                                'dontknow', 'old_prs'],
+                            'col_title_width': 60, 'reverted_shas': set(), 'release_prs': None,
+                            'prev_release_commit_date': '2026-01-01', 'pr_base': 'main',
+                            'reconcile_labels': False, 'output_format': 'rst',
+                            'output_file': os.path.join(self.tmp_dir, 'prs.rst')}.items():
+            setattr(acs_report_prs, name, value)
+        acs_report_prs.report = report_state.ReportState(acs_report_prs.new_report_tables)
+        self.prs = pr_collection.PRCollection()
+        self.prs.add([webhooks.record_from_pull(pull(10, "Open work", [])),
+                      webhooks.record_from_pull(pull(20, "Old title", ['type:bug', 'Severity:Major'],
+                                                     'closed', '2026-09-02T10:00:00Z'))])
+        for number in self.prs.prs:
+            acs_report_prs.reclassify(self.prs, number)
+
+    def tearDown(self):
+        self.receiver.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def rows(self):
+        tables, counts, changes = acs_report_prs.report.tables()
+        return dict((name, [(row[0], row[1]) for row in table.rows]) for name, table in tables.items())
+
+    def replay(self, events):
+        self.assertEqual(webhooks.replay(self.receiver.url, SECRET, events), [202] * len(events))
+        acs_report_prs.apply_events(self.prs, self.receiver.next_events(timeout=5))
+        return self.rows()
+
+    def test_new_label_adds_the_pr(self):
+        self.assertEqual(self.rows()['wip_features'], [])
+        rows = self.replay([event('labeled', pull(10, "Open work", ['wip']))])
+        self.assertEqual(rows['wip_features'], [('10', "Open work")])
+
+    def test_title_edit_renames_the_row(self):
+        self.assertEqual(self.rows()['merged_fixes'], [('20', "Old title")])
+        rows = self.replay([event('edited', pull(20, "New title", ['type:bug', 'Severity:Major'],
+                                                 'closed', '2026-09-02T10:00:00Z'))])
+        self.assertEqual(rows['merged_fixes'], [('20', "New title")])
+        with open(acs_report_prs.output_file) as report:
+            text = report.read()
+        self.assertIn("New title", text)
+        self.assertNotIn("Old title", text)
+
+
+if __name__ == '__main__':
+    unittest.main()